@@ -1,7 +1,14 @@
 import anthropic
-from typing import List, Optional, Dict, Any
+import asyncio
+import httpx
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 
+# Shared pool for running independent tool calls within a round
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
+
 
 @dataclass
 class ToolExecutionResult:
@@ -41,20 +48,52 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
 
+    # Cacheable system block list, built once since the prompt never changes
+    _SYSTEM_BLOCKS = [
+        {
+            "type": "text",
+            "text": SYSTEM_PROMPT,
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
     # Maximum number of sequential tool calling rounds
     MAX_TOOL_ROUNDS = 2
 
+    # Maximum number of in-flight Anthropic requests per generator
+    MAX_CONCURRENT_REQUESTS = 10
+
+    # Maximum number of tool call groups queued on the shared tool pool
+    MAX_PENDING_TOOL_TASKS = 16
+
     def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Persistent HTTP/2 pool: tool rounds and concurrent queries share
+        # warm connections instead of repeating the TLS handshake per call
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        )
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
         self.model = model
 
+        # Caps concurrent connections to Anthropic across all queries
+        self._request_semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+
+        # Admission control for the tool pool: excess work waits here, on the
+        # event loop, instead of piling up in the executor's unbounded queue
+        self._tool_semaphore = asyncio.Semaphore(self.MAX_PENDING_TOOL_TASKS)
+
         # Pre-build base API parameters
         self.base_params = {"model": self.model, "temperature": 0, "max_tokens": 800}
+        self._base_params_with_system = {
+            **self.base_params,
+            "system": self._SYSTEM_BLOCKS,
+        }
 
-    def generate_response(
+    async def generate_response(
         self,
         query: str,
-        conversation_history: Optional[str] = None,
+        conversation_history: Optional[List[Dict[str, str]]] = None,
         tools: Optional[List] = None,
         tool_manager=None,
     ) -> str:
@@ -64,43 +103,43 @@ Provide only the direct answer to what was asked.
 
         Args:
             query: The user's question or request
-            conversation_history: Previous messages for context
+            conversation_history: Previous user/assistant messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
 
         Returns:
             Generated response as string
         """
+        # Prior turns go ahead of the query so the system prefix stays stable
+        messages = [
+            *self._build_history_messages(conversation_history),
+            {"role": "user", "content": query},
+        ]
 
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history
-            else self.SYSTEM_PROMPT
-        )
-
-        # Initialize messages
-        messages = [{"role": "user", "content": query}]
-
-        # Prepare API call parameters
-        api_params = {**self.base_params, "system": system_content}
+        # Prepare API call parameters (shallow copy of the prebuilt base)
+        api_params = dict(self._base_params_with_system)
 
         # Add tools if available
         if tools:
-            api_params["tools"] = tools
+            api_params["tools"] = self._with_cache_breakpoint(tools)
             api_params["tool_choice"] = {"type": "auto"}
 
+        # Outputs of tool calls already run for this query, by (name, input)
+        tool_outputs: Dict[Tuple[str, str], str] = {}
+
         # Tool execution loop
         for _ in range(self.MAX_TOOL_ROUNDS):
             api_params["messages"] = messages
-            response = self.client.messages.create(**api_params)
+            response = await self._create_message(api_params)
 
             # No tool use - return response
             if response.stop_reason != "tool_use" or not tool_manager:
                 return self._extract_text_response(response)
 
             # Execute tools
-            result = self._execute_tool_round(response, messages, tool_manager)
+            result = await self._execute_tool_round(
+                response, messages, tool_manager, tool_outputs
+            )
 
             if result.error:
                 return result.error_message
@@ -110,61 +149,189 @@ Provide only the direct answer to what was asked.
         # Max rounds reached - force text response
         api_params["messages"] = messages
         api_params["tool_choice"] = {"type": "none"}
-        final_response = self.client.messages.create(**api_params)
+        final_response = await self._create_message(api_params)
         return self._extract_text_response(final_response)
 
+    async def _create_message(self, api_params: Dict[str, Any]):
+        """Send a Messages API request, bounded by the request semaphore."""
+        async with self._request_semaphore:
+            return await self.client.messages.create(**api_params)
+
+    @staticmethod
+    def _build_history_messages(
+        conversation_history: Optional[List[Dict[str, str]]],
+    ) -> List[Dict[str, Any]]:
+        """Convert conversation history into API messages.
+
+        The last history message carries a cache breakpoint so the
+        conversational prefix is cached along with the system prompt.
+        Messages with blank content (e.g. an answer to a tool round that
+        ended without text) are skipped, since the API rejects them.
+        """
+        messages = [m for m in conversation_history or () if m["content"].strip()]
+        if not messages:
+            return []
+
+        *earlier, last = messages
+        return [
+            *({"role": m["role"], "content": m["content"]} for m in earlier),
+            {
+                "role": last["role"],
+                "content": [
+                    {
+                        "type": "text",
+                        "text": last["content"],
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                ],
+            },
+        ]
+
+    @staticmethod
+    def _with_cache_breakpoint(tools: List) -> List:
+        """Return a copy of tools with a cache breakpoint on the last definition.
+
+        Anthropic caches everything up to and including the marked block, so
+        this caches the tool schemas together with the system prompt. The
+        caller's definitions are left untouched.
+        """
+        return [
+            *tools[:-1],
+            {**tools[-1], "cache_control": {"type": "ephemeral"}},
+        ]
+
     def _extract_text_response(self, response) -> str:
         """Extract text content from API response."""
         for content_block in response.content:
-            if hasattr(content_block, "text") and content_block.text:
+            if content_block.type == "text" and content_block.text:
                 return content_block.text
         return ""
 
-    def _execute_tool_round(
-        self, response, current_messages: List[Dict[str, Any]], tool_manager
+    async def _execute_tool_round(
+        self,
+        response,
+        current_messages: List[Dict[str, Any]],
+        tool_manager,
+        tool_outputs: Optional[Dict[Tuple[str, str], str]] = None,
     ) -> ToolExecutionResult:
         """
         Execute all tool calls in a single response round.
 
         Args:
             response: API response containing tool use requests
-            current_messages: Current message list
+            current_messages: Message list for this query; extended in place
             tool_manager: Manager to execute tools
+            tool_outputs: Outputs of earlier calls in this query; a call with
+                the same name and input reuses its output instead of running
+                again, and new outputs are added
 
         Returns:
             ToolExecutionResult with updated messages or error info
         """
-        # Copy messages to avoid mutating original
-        messages = current_messages.copy()
+        # generate_response owns this list and rebinds to the result, so
+        # extend it in place rather than copying it every round
+        messages = current_messages
 
         # Add assistant's response (contains tool_use blocks)
         messages.append({"role": "assistant", "content": response.content})
 
         # Execute all tool calls and collect results
-        tool_results = []
-        for content_block in response.content:
-            if content_block.type == "tool_use":
-                try:
-                    tool_result = tool_manager.execute_tool(
-                        content_block.name, **content_block.input
-                    )
-                    tool_results.append(
-                        {
-                            "type": "tool_result",
-                            "tool_use_id": content_block.id,
-                            "content": tool_result,
-                        }
-                    )
-                except Exception as e:
-                    # Tool execution failed
-                    return ToolExecutionResult(
-                        updated_messages=messages,
-                        error=True,
-                        error_message=f"Tool execution failed: {str(e)}",
-                    )
+        tool_blocks = [block for block in response.content if block.type == "tool_use"]
+        if tool_outputs is None:
+            tool_outputs = {}
+
+        # Repeated calls (within the round or from an earlier one) run once
+        keys = [self._tool_call_key(block) for block in tool_blocks]
+        pending = {}
+        for key, block in zip(keys, tool_blocks):
+            if key not in tool_outputs:
+                pending.setdefault(key, block)
+        try:
+            outputs = await self._run_tools(list(pending.values()), tool_manager)
+        except Exception as e:
+            # Tool execution failed
+            return ToolExecutionResult(
+                updated_messages=messages,
+                error=True,
+                error_message=f"Tool execution failed: {str(e)}",
+            )
+
+        tool_outputs.update(zip(pending, outputs))
+
+        # Results keep the order of the tool_use blocks they answer
+        tool_results = [
+            {
+                "type": "tool_result",
+                "tool_use_id": block.id,
+                "content": tool_outputs[key],
+            }
+            for block, key in zip(tool_blocks, keys)
+        ]
 
         # Add tool results as user message
         if tool_results:
             messages.append({"role": "user", "content": tool_results})
 
         return ToolExecutionResult(updated_messages=messages)
+
+    @staticmethod
+    def _tool_call_key(block) -> Tuple[str, str]:
+        """Identify a tool call by its name and canonicalised input."""
+        return block.name, json.dumps(block.input, sort_keys=True, default=str)
+
+    async def _run_tools(self, tool_blocks: List, tool_manager) -> List[str]:
+        """
+        Execute tool calls on the shared tool pool.
+
+        Tools do blocking vector-store work, so they run off the event loop.
+        The caller passes only calls not already answered in this query:
+        a repeated (name, input) reuses its earlier output without running
+        the tool again, so it does not update per-instance state such as
+        CourseSearchTool.last_sources. Of the calls passed in, calls to the
+        same tool run serially in block order, so that state ends up as the
+        last distinct call to each tool left it. Calls to different tools
+        (e.g. a search plus an outline lookup) run concurrently; embedding
+        inference and Chroma queries spend much of their time in native code,
+        so these calls can overlap. At most MAX_PENDING_TOOL_TASKS groups are
+        handed to the pool at once across all queries on this generator.
+
+        Every call in the round is started even if one of them fails. Outputs
+        are returned in the order of tool_blocks, and the exception from the
+        first failing block (in block order) is re-raised.
+        """
+        calls_by_tool: Dict[str, List[int]] = {}
+        for index, block in enumerate(tool_blocks):
+            calls_by_tool.setdefault(block.name, []).append(index)
+
+        def run_calls(indices: List[int]) -> List[Any]:
+            outcomes = []
+            for index in indices:
+                block = tool_blocks[index]
+                try:
+                    outcomes.append(
+                        tool_manager.execute_tool(block.name, **block.input)
+                    )
+                except Exception as e:
+                    outcomes.append(e)
+            return outcomes
+
+        loop = asyncio.get_running_loop()
+
+        async def run_group(indices: List[int]) -> List[Any]:
+            async with self._tool_semaphore:
+                return await loop.run_in_executor(_TOOL_EXECUTOR, run_calls, indices)
+
+        groups = list(calls_by_tool.values())
+        group_outcomes = await asyncio.gather(
+            *(run_group(indices) for indices in groups)
+        )
+
+        outcomes = [None] * len(tool_blocks)
+        for indices, results in zip(groups, group_outcomes):
+            for index, outcome in zip(indices, results):
+                outcomes[index] = outcome
+
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                raise outcome
+        return outcomes
@@ -26,12 +26,18 @@ class RAGSystem:
         )
         self.session_manager = SessionManager(config.MAX_HISTORY)
 
-        # Initialize search tools
-        self.tool_manager = ToolManager()
-        self.search_tool = CourseSearchTool(self.vector_store)
-        self.tool_manager.register_tool(self.search_tool)
-        self.outline_tool = CourseOutlineTool(self.vector_store)
-        self.tool_manager.register_tool(self.outline_tool)
+    def _create_tool_manager(self) -> ToolManager:
+        """
+        Create a ToolManager with the course tools registered.
+
+        The search tool records the sources of its last search, so each query
+        gets its own manager; concurrent queries would otherwise read or
+        reset each other's sources while awaiting the AI.
+        """
+        tool_manager = ToolManager()
+        tool_manager.register_tool(CourseSearchTool(self.vector_store))
+        tool_manager.register_tool(CourseOutlineTool(self.vector_store))
+        return tool_manager
 
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
@@ -118,7 +124,7 @@ class RAGSystem:
 
         return total_courses, total_chunks
 
-    def query(
+    async def query(
         self, query: str, session_id: Optional[str] = None
     ) -> Tuple[str, List[str]]:
         """
@@ -139,19 +145,17 @@ class RAGSystem:
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
 
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
+        # Generate response using AI with this query's tools
+        tool_manager = self._create_tool_manager()
+        response = await self.ai_generator.generate_response(
             query=prompt,
             conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager,
+            tools=tool_manager.get_tool_definitions(),
+            tool_manager=tool_manager,
         )
 
         # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
-
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+        sources = tool_manager.get_last_sources()
 
         # Update conversation history
         if session_id:
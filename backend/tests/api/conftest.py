@@ -0,0 +1,140 @@
+"""Fixtures for FastAPI endpoint tests"""
+
+import httpx
+import pytest
+import pytest_asyncio
+from unittest.mock import AsyncMock, MagicMock
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
+
+
+@pytest.fixture
+def mock_rag_system():
+    """Mock RAGSystem for API testing"""
+    mock = MagicMock()
+
+    # Mock session manager
+    mock.session_manager.create_session.return_value = "test-session-123"
+    mock.session_manager.clear_session.return_value = None
+
+    # Mock query method (async, like RAGSystem.query)
+    mock.query = AsyncMock()
+    mock.query.return_value = (
+        "MCP stands for Model Context Protocol.",
+        [{"text": "Introduction to MCP, Lesson 1", "url": "https://example.com/lesson1"}]
+    )
+
+    # Mock course analytics
+    mock.get_course_analytics.return_value = {
+        "total_courses": 3,
+        "course_titles": ["Introduction to MCP", "Advanced Claude", "AI Fundamentals"]
+    }
+
+    return mock
+
+
+# Test app without static file mounting. Built once at import; each test
+# only swaps the RAG system it talks to.
+app = FastAPI(title="Course Materials RAG System - Test")
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+# Pydantic models (mirrors app.py to avoid importing it)
+class QueryRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+
+
+class SourceItem(BaseModel):
+    text: str
+    url: Optional[str] = None
+
+
+class QueryResponse(BaseModel):
+    answer: str
+    sources: List[SourceItem]
+    session_id: str
+
+
+class CourseStats(BaseModel):
+    total_courses: int
+    course_titles: List[str]
+
+
+class SessionClearRequest(BaseModel):
+    session_id: str
+
+
+class SessionClearResponse(BaseModel):
+    success: bool
+    message: str
+
+
+@app.post("/api/query", response_model=QueryResponse)
+async def query_documents(request: QueryRequest):
+    try:
+        rag = app.state.rag_system
+        session_id = request.session_id
+        if not session_id:
+            session_id = rag.session_manager.create_session()
+        answer, sources = await rag.query(request.query, session_id)
+        return QueryResponse(answer=answer, sources=sources, session_id=session_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/courses", response_model=CourseStats)
+async def get_course_stats():
+    try:
+        rag = app.state.rag_system
+        analytics = rag.get_course_analytics()
+        return CourseStats(
+            total_courses=analytics["total_courses"],
+            course_titles=analytics["course_titles"]
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/session/clear", response_model=SessionClearResponse)
+async def clear_session(request: SessionClearRequest):
+    try:
+        rag = app.state.rag_system
+        rag.session_manager.clear_session(request.session_id)
+        return SessionClearResponse(success=True, message="Session cleared successfully")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/")
+async def root():
+    return {"status": "ok", "message": "RAG System API"}
+
+
+@pytest.fixture(autouse=True)
+def test_app(mock_rag_system):
+    """Point the shared test app at this test's mock RAGSystem"""
+    app.state.rag_system = mock_rag_system
+    return app
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def test_client():
+    """In-process async HTTP client for API testing, opened once per module
+
+    The app reads its RAG system from app.state on every request, so the
+    client can outlive the per-test mock that test_app installs.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
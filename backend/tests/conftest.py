@@ -1,141 +1,45 @@
 """Shared fixtures for RAG chatbot tests"""
 
+import hashlib
+import os
 import pytest
+from pathlib import Path
+from types import SimpleNamespace
 from unittest.mock import MagicMock, Mock, patch
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
-import sys
-import os
+from typing import List, Dict, Any, Optional, Tuple
 
-# Add backend to path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 
+import ai_generator
+from tests.fakes import FakeMessages, MockContentBlock, MockMessage
 from vector_store import SearchResults
 
 
-# ============================================================================
-# API Testing Fixtures
-# ============================================================================
-
-@pytest.fixture
-def mock_rag_system():
-    """Mock RAGSystem for API testing"""
-    mock = MagicMock()
-
-    # Mock session manager
-    mock.session_manager.create_session.return_value = "test-session-123"
-    mock.session_manager.clear_session.return_value = None
-
-    # Mock query method
-    mock.query.return_value = (
-        "MCP stands for Model Context Protocol.",
-        [{"text": "Introduction to MCP, Lesson 1", "url": "https://example.com/lesson1"}]
+def pytest_addoption(parser):
+    parser.addoption(
+        "--integration",
+        action="store_true",
+        default=False,
+        help="also run tests marked integration (real ChromaDB and embeddings)",
     )
 
-    # Mock course analytics
-    mock.get_course_analytics.return_value = {
-        "total_courses": 3,
-        "course_titles": ["Introduction to MCP", "Advanced Claude", "AI Fundamentals"]
-    }
-
-    return mock
 
+def pytest_collection_modifyitems(config, items):
+    """Skip integration tests unless --integration was given"""
+    if config.getoption("--integration"):
+        return
+    skip_integration = pytest.mark.skip(reason="needs --integration to run")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip_integration)
 
-@pytest.fixture
-def test_app(mock_rag_system):
-    """Create a test FastAPI app without static file mounting"""
-    from fastapi import FastAPI, HTTPException
-    from fastapi.middleware.cors import CORSMiddleware
-    from pydantic import BaseModel
-    from typing import List, Optional
-
-    # Create fresh app for testing
-    app = FastAPI(title="Course Materials RAG System - Test")
-
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
 
-    # Pydantic models (inline to avoid import issues)
-    class QueryRequest(BaseModel):
-        query: str
-        session_id: Optional[str] = None
-
-    class SourceItem(BaseModel):
-        text: str
-        url: Optional[str] = None
-
-    class QueryResponse(BaseModel):
-        answer: str
-        sources: List[SourceItem]
-        session_id: str
-
-    class CourseStats(BaseModel):
-        total_courses: int
-        course_titles: List[str]
-
-    class SessionClearRequest(BaseModel):
-        session_id: str
-
-    class SessionClearResponse(BaseModel):
-        success: bool
-        message: str
-
-    # Store mock in app state for access in endpoints
-    app.state.rag_system = mock_rag_system
-
-    @app.post("/api/query", response_model=QueryResponse)
-    async def query_documents(request: QueryRequest):
-        try:
-            rag = app.state.rag_system
-            session_id = request.session_id
-            if not session_id:
-                session_id = rag.session_manager.create_session()
-            answer, sources = rag.query(request.query, session_id)
-            return QueryResponse(answer=answer, sources=sources, session_id=session_id)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    @app.get("/api/courses", response_model=CourseStats)
-    async def get_course_stats():
-        try:
-            rag = app.state.rag_system
-            analytics = rag.get_course_analytics()
-            return CourseStats(
-                total_courses=analytics["total_courses"],
-                course_titles=analytics["course_titles"]
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    @app.post("/api/session/clear", response_model=SessionClearResponse)
-    async def clear_session(request: SessionClearRequest):
-        try:
-            rag = app.state.rag_system
-            rag.session_manager.clear_session(request.session_id)
-            return SessionClearResponse(success=True, message="Session cleared successfully")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    @app.get("/")
-    async def root():
-        return {"status": "ok", "message": "RAG System API"}
-
-    return app
-
-
-@pytest.fixture
-def test_client(test_app):
-    """Create TestClient for API testing"""
-    from starlette.testclient import TestClient
-    return TestClient(test_app)
-
-
-@pytest.fixture
+# Session-scoped data fixtures are shared by every test: read them, never
+# mutate them (build a new SearchResults when a test needs a variant)
+@pytest.fixture(scope="session")
 def mock_search_results_with_data():
     """SearchResults with actual course content"""
     return SearchResults(
@@ -159,13 +63,13 @@ def mock_search_results_with_data():
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_search_results_empty():
     """Empty SearchResults"""
     return SearchResults(documents=[], metadata=[], distances=[])
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_search_results_with_error():
     """SearchResults with error"""
     return SearchResults(
@@ -176,64 +80,89 @@ def mock_search_results_with_error():
     )
 
 
-@pytest.fixture
-def mock_vector_store():
-    """Mock VectorStore for testing CourseSearchTool"""
+@pytest.fixture(scope="session")
+def shared_mock_vector_store():
+    """Session-wide VectorStore mock; tests should use mock_vector_store"""
     mock = MagicMock()
     mock.max_results = 5
     return mock
 
 
 @pytest.fixture
-def mock_anthropic_response_text():
-    """Mock Anthropic response with just text (no tool use)"""
-    mock_response = MagicMock()
-    mock_response.stop_reason = "end_turn"
-    mock_content = MagicMock()
-    mock_content.type = "text"
-    mock_content.text = "This is a direct response without tool use."
-    mock_response.content = [mock_content]
-    return mock_response
+def mock_vector_store(shared_mock_vector_store):
+    """Mock VectorStore for testing CourseSearchTool, reset for each test
+
+    Resetting is several times cheaper than building a new MagicMock; it
+    clears calls, configured return values and side effects.
+    """
+    shared_mock_vector_store.reset_mock(return_value=True, side_effect=True)
+    return shared_mock_vector_store
+
+
+@pytest.fixture(scope="module")
+def patched_anthropic():
+    """Patch AIGenerator's Anthropic client class once per test module"""
+    with patch.object(ai_generator.anthropic, "AsyncAnthropic") as mock_anthropic_class:
+        yield mock_anthropic_class
 
 
 @pytest.fixture
-def mock_anthropic_response_tool_use():
-    """Mock Anthropic response requesting tool use"""
-    mock_response = MagicMock()
-    mock_response.stop_reason = "tool_use"
+def mock_client(patched_anthropic):
+    """Fresh scripted Anthropic client returned by the patched class"""
+    patched_anthropic.reset_mock()
+    client = SimpleNamespace(messages=FakeMessages())
+    patched_anthropic.return_value = client
+    return client
+
 
-    # Text block
-    mock_text = MagicMock()
-    mock_text.type = "text"
-    mock_text.text = ""
+@pytest.fixture(scope="session")
+def mock_anthropic_response_text():
+    """Mock Anthropic response with just text (no tool use)"""
+    return MockMessage(
+        stop_reason="end_turn",
+        content=(
+            MockContentBlock(
+                type="text", text="This is a direct response without tool use."
+            ),
+        ),
+    )
 
-    # Tool use block
-    mock_tool = MagicMock()
-    mock_tool.type = "tool_use"
-    mock_tool.id = "tool_123"
-    mock_tool.name = "search_course_content"
-    mock_tool.input = {"query": "What is MCP?", "course_name": "Introduction to MCP"}
 
-    mock_response.content = [mock_text, mock_tool]
-    return mock_response
+@pytest.fixture(scope="session")
+def mock_anthropic_response_tool_use():
+    """Mock Anthropic response requesting tool use"""
+    return MockMessage(
+        stop_reason="tool_use",
+        content=(
+            MockContentBlock(type="text", text=""),
+            MockContentBlock(
+                type="tool_use",
+                id="tool_123",
+                name="search_course_content",
+                input={"query": "What is MCP?", "course_name": "Introduction to MCP"},
+            ),
+        ),
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_anthropic_final_response():
     """Mock final Anthropic response after tool execution"""
-    mock_response = MagicMock()
-    mock_response.stop_reason = "end_turn"
-    mock_content = MagicMock()
-    mock_content.type = "text"
-    mock_content.text = "MCP stands for Model Context Protocol. It enables AI models to access external tools and data sources."
-    mock_response.content = [mock_content]
-    return mock_response
+    return MockMessage(
+        stop_reason="end_turn",
+        content=(
+            MockContentBlock(
+                type="text",
+                text="MCP stands for Model Context Protocol. It enables AI models to access external tools and data sources.",
+            ),
+        ),
+    )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_tool_definitions():
     """Sample tool definitions for testing"""
-    return [
+    return (
         {
             "name": "search_course_content",
             "description": "Search course materials",
@@ -246,5 +175,77 @@ def sample_tool_definitions():
                 },
                 "required": ["query"],
             },
-        }
-    ]
+        },
+    )
+
+
+class CachingEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """SentenceTransformer embeddings, encoding each distinct text only once
+
+    Tests reuse the same handful of documents and queries, and the model is
+    deterministic, so repeats are served from memory for the whole session.
+    With a cache_dir, vectors are also saved as <sha256>.npy files (keyed by
+    model name and text) so later sessions skip the model entirely.
+    """
+
+    def __init__(self, *args, cache_dir: Optional[Path] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._embeddings = {}
+        self._cache_dir = cache_dir
+
+    def __call__(self, input):
+        missing = [
+            text
+            for text in dict.fromkeys(input)
+            if text not in self._embeddings and not self._load_from_disk(text)
+        ]
+        if missing:
+            computed = super().__call__(missing)
+            self._embeddings.update(zip(missing, computed))
+            for text, embedding in zip(missing, computed):
+                self._save_to_disk(text, embedding)
+        return [self._embeddings[text] for text in input]
+
+    def _disk_path(self, text: str) -> Path:
+        key = hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest()
+        return self._cache_dir / f"{key}.npy"
+
+    def _load_from_disk(self, text: str) -> bool:
+        """Load a saved vector into memory; False if there is none"""
+        if self._cache_dir is None:
+            return False
+        path = self._disk_path(text)
+        if not path.exists():
+            return False
+        self._embeddings[text] = np.load(path)
+        return True
+
+    def _save_to_disk(self, text: str, embedding):
+        if self._cache_dir is None:
+            return
+        # Write then rename so a concurrent reader never sees a partial file
+        path = self._disk_path(text)
+        partial = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(partial, "wb") as f:
+            np.save(f, embedding)
+        os.replace(partial, path)
+
+
+@pytest.fixture(scope="module")
+def chroma_client():
+    """In-memory ChromaDB client, so tests that don't need persistence skip disk"""
+    return chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+
+
+@pytest.fixture(scope="session")
+def shared_embedding_fn(pytestconfig):
+    """One caching embedding function for every real VectorStore
+
+    Vectors persist in pytest's cache dir (cleared by --cache-clear); with
+    the cache provider disabled they are only kept for the session.
+    """
+    cache = getattr(pytestconfig, "cache", None)
+    return CachingEmbeddingFunction(
+        model_name="all-MiniLM-L6-v2",
+        cache_dir=cache.mkdir("embeddings") if cache is not None else None,
+    )
@@ -0,0 +1,67 @@
+"""Stand-ins for Anthropic API objects shared by the test modules"""
+
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Tuple
+
+
+@dataclass(frozen=True)
+class MockContentBlock:
+    """Stand-in for an Anthropic text or tool_use content block"""
+
+    type: str
+    text: str = ""
+    id: str = ""
+    name: str = ""
+    input: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class MockMessage:
+    """Stand-in for an Anthropic Message response"""
+
+    stop_reason: str
+    content: Tuple[MockContentBlock, ...]
+
+
+def multi_tool_response(*tool_specs):
+    """Build a tool_use response with one block per (id, name, input) spec"""
+    return MockMessage(
+        stop_reason="tool_use",
+        content=tuple(
+            MockContentBlock(type="tool_use", id=tool_id, name=name, input=tool_input)
+            for tool_id, name, tool_input in tool_specs
+        ),
+    )
+
+
+def final_response(text):
+    """Build an end_turn response with a single text block"""
+    return MockMessage(
+        stop_reason="end_turn", content=(MockContentBlock(type="text", text=text),)
+    )
+
+
+class FakeMessages:
+    """Scripted stand-in for client.messages
+
+    create() replays ``responses`` in order, repeating the last one once the
+    script runs out, and records each call's kwargs in ``calls``. A callable
+    entry is awaited with the call's kwargs instead, for tests that need to
+    block or raise. The messages list is snapshotted per call because
+    AIGenerator extends it in place between rounds.
+    """
+
+    def __init__(self):
+        self.responses = []
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(
+            SimpleNamespace(kwargs={**kwargs, "messages": list(kwargs["messages"])})
+        )
+        index = min(len(self.calls), len(self.responses)) - 1
+        response = self.responses[index]
+        if callable(response):
+            return await response(**kwargs)
+        return response
@@ -8,134 +8,192 @@ These tests evaluate:
 4. Correct API parameter passing
 """
 
+import asyncio
+import httpx
 import pytest
-from unittest.mock import MagicMock, patch, Mock
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from unittest.mock import create_autospec, patch
+import threading
+import time
 
 from ai_generator import AIGenerator
+from search_tools import ToolManager
+from tests.fakes import (
+    MockContentBlock,
+    MockMessage,
+    final_response,
+    multi_tool_response,
+)
 
+# Tokens the system prompt must carry (checked case-insensitively)
+REQUIRED_PROMPT_TOKENS = frozenset({"tool"})
+REQUIRED_PROMPT_ANY = frozenset({"search_course_content", "course"})
 
-class TestAIGeneratorDirectResponse:
-    """Tests for direct response generation (no tool use)"""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_returns_text_for_simple_query(
-        self, mock_anthropic_class
-    ):
-        """Test that generate_response returns text when no tool use is needed"""
-        # Setup mock
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Python is a programming language."
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
-
-        # Test
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        result = generator.generate_response(query="What is Python?")
+def _has_prompt_instructions(text):
+    """Check a system prompt for the required tool-use instructions"""
+    lowered = text.lower()
+    return all(t in lowered for t in REQUIRED_PROMPT_TOKENS) and any(
+        t in lowered for t in REQUIRED_PROMPT_ANY
+    )
 
-        assert result == "Python is a programming language."
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_includes_conversation_history(
-        self, mock_anthropic_class
-    ):
-        """Test that conversation history is included in system prompt"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
+def _tool_results(messages):
+    """Collect the tool_result blocks sent back in user messages, in order"""
+    return [
+        block
+        for message in messages
+        if message["role"] == "user" and isinstance(message["content"], list)
+        for block in message["content"]
+        if block.get("type") == "tool_result"
+    ]
 
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Response"
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
 
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        generator.generate_response(
-            query="Follow up question",
-            conversation_history="User: What is MCP?\nAssistant: MCP is Model Context Protocol.",
-        )
+@pytest.fixture
+def generator(mock_client):
+    """AIGenerator wired to this test's client mock"""
+    return AIGenerator(api_key="test_key", model="claude-3-sonnet")
 
-        # Verify history was included
-        call_args = mock_client.messages.create.call_args
-        system_content = call_args.kwargs.get("system", "")
-        assert "Previous conversation" in system_content
-        assert "What is MCP?" in system_content
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_passes_tools_when_provided(self, mock_anthropic_class):
-        """Test that tools are passed to API when provided"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
+@pytest.fixture(scope="session")
+def search_tools():
+    """Read-only definition list offering the search tool"""
+    return ({"name": "search_course_content"},)
 
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Response"
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
 
-        tools = [{"name": "test_tool", "description": "A test tool"}]
+@pytest.fixture
+def mock_tool_manager():
+    """ToolManager stand-in whose tools all return a fixed result"""
+    manager = create_autospec(ToolManager, instance=True)
+    manager.execute_tool.return_value = "Tool result"
+    return manager
 
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        generator.generate_response(query="Query", tools=tools)
 
-        call_args = mock_client.messages.create.call_args
-        assert call_args.kwargs.get("tools") == tools
-        assert call_args.kwargs.get("tool_choice") == {"type": "auto"}
+_DIRECT_HISTORY = (
+    {"role": "user", "content": "What is MCP?"},
+    {"role": "assistant", "content": "MCP is Model Context Protocol."},
+)
+_DIRECT_TOOLS = ({"name": "test_tool", "description": "A test tool"},)
+
+
+class TestAIGeneratorDirectResponse:
+    """Tests for direct response generation (no tool use)"""
+
+    @pytest.mark.parametrize(
+        "call_kwargs, check",
+        [
+            (
+                {"query": "What is Python?"},
+                lambda call, result: result == "Python is a programming language.",
+            ),
+            # System prompt stays static; history precedes the new query
+            (
+                {
+                    "query": "Follow up question",
+                    "conversation_history": list(_DIRECT_HISTORY),
+                },
+                lambda call, result: [b["text"] for b in call.kwargs["system"]]
+                == [AIGenerator.SYSTEM_PROMPT]
+                and call.kwargs["messages"]
+                == [
+                    _DIRECT_HISTORY[0],
+                    {
+                        "role": "assistant",
+                        "content": [
+                            {
+                                "type": "text",
+                                "text": _DIRECT_HISTORY[1]["content"],
+                                "cache_control": {"type": "ephemeral"},
+                            }
+                        ],
+                    },
+                    {"role": "user", "content": "Follow up question"},
+                ],
+            ),
+            # Tools get a cache breakpoint; caller's definitions are not mutated
+            (
+                {"query": "Query", "tools": list(_DIRECT_TOOLS)},
+                lambda call, result: call.kwargs["tools"]
+                == [{**_DIRECT_TOOLS[0], "cache_control": {"type": "ephemeral"}}]
+                and call.kwargs["tool_choice"] == {"type": "auto"}
+                and "cache_control" not in _DIRECT_TOOLS[0],
+            ),
+        ],
+        ids=["text", "history", "tools"],
+    )
+    async def test_direct_response(self, mock_client, generator, call_kwargs, check):
+        """Test a single end_turn call for each kind of direct query"""
+        mock_client.messages.responses = [
+            final_response("Python is a programming language.")
+        ]
+
+        result = await generator.generate_response(**call_kwargs)
+
+        assert check(mock_client.messages.calls[-1], result)
+
+    async def test_blank_history_messages_skipped(self, mock_client, generator):
+        """Test that an empty stored answer is not replayed to the API"""
+        mock_client.messages.responses = [final_response("Answer")]
+        history = [
+            {"role": "user", "content": "What is MCP?"},
+            {"role": "assistant", "content": ""},
+            {"role": "user", "content": "Lesson 2?"},
+            {"role": "assistant", "content": "  "},
+        ]
+
+        await generator.generate_response(
+            query="Follow up", conversation_history=history
+        )
+
+        assert mock_client.messages.calls[-1].kwargs["messages"] == [
+            {"role": "user", "content": "What is MCP?"},
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "Lesson 2?",
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                ],
+            },
+            {"role": "user", "content": "Follow up"},
+        ]
 
 
 class TestAIGeneratorToolExecution:
     """Tests for tool use detection and execution"""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_generate_response_detects_tool_use_request(self, mock_anthropic_class):
+    async def test_generate_response_detects_tool_use_request(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
         """Test that tool use is detected when stop_reason is 'tool_use'"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
         # First response requests tool use
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_text = MagicMock()
-        mock_text.type = "text"
-        mock_text.text = ""
-        mock_tool_block = MagicMock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.id = "tool_abc123"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.input = {"query": "What is MCP?"}
-        mock_tool_response.content = [mock_text, mock_tool_block]
+        mock_tool_response = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(type="text", text=""),
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_abc123",
+                    name="search_course_content",
+                    input={"query": "What is MCP?"},
+                ),
+            ),
+        )
 
         # Final response after tool execution
-        mock_final_response = MagicMock()
-        mock_final_response.stop_reason = "end_turn"
-        mock_final_content = MagicMock()
-        mock_final_content.text = "MCP is Model Context Protocol."
-        mock_final_response.content = [mock_final_content]
+        mockfinal_response = final_response("MCP is Model Context Protocol.")
 
-        mock_client.messages.create.side_effect = [
+        mock_client.messages.responses = [
             mock_tool_response,
-            mock_final_response,
+            mockfinal_response,
         ]
 
         # Setup tool manager
-        mock_tool_manager = MagicMock()
         mock_tool_manager.execute_tool.return_value = "Tool result: MCP information"
 
-        tools = [{"name": "search_course_content"}]
-
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        result = generator.generate_response(
-            query="What is MCP?", tools=tools, tool_manager=mock_tool_manager
+        result = await generator.generate_response(
+            query="What is MCP?", tools=search_tools, tool_manager=mock_tool_manager
         )
 
         # Verify tool was executed
@@ -146,44 +204,39 @@ class TestAIGeneratorToolExecution:
         # Verify final response is returned
         assert result == "MCP is Model Context Protocol."
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_execution_passes_correct_parameters(self, mock_anthropic_class):
+    async def test_tool_execution_passes_correct_parameters(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
         """Test that tool parameters are passed correctly to tool_manager"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
         # Tool use response with multiple parameters
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool_block = MagicMock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.id = "tool_123"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.input = {
-            "query": "installation steps",
-            "course_name": "MCP Introduction",
-            "lesson_number": 2,
-        }
-        mock_tool_response.content = [mock_tool_block]
-
-        mock_final_response = MagicMock()
-        mock_final_response.stop_reason = "end_turn"
-        mock_final_content = MagicMock()
-        mock_final_content.text = "Final answer"
-        mock_final_response.content = [mock_final_content]
-
-        mock_client.messages.create.side_effect = [
+        mock_tool_response = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_123",
+                    name="search_course_content",
+                    input={
+                        "query": "installation steps",
+                        "course_name": "MCP Introduction",
+                        "lesson_number": 2,
+                    },
+                ),
+            ),
+        )
+
+        mockfinal_response = final_response("Final answer")
+
+        mock_client.messages.responses = [
             mock_tool_response,
-            mock_final_response,
+            mockfinal_response,
         ]
 
-        mock_tool_manager = MagicMock()
         mock_tool_manager.execute_tool.return_value = "Tool results"
 
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        generator.generate_response(
+        await generator.generate_response(
             query="Query",
-            tools=[{"name": "search_course_content"}],
+            tools=search_tools,
             tool_manager=mock_tool_manager,
         )
 
@@ -195,103 +248,131 @@ class TestAIGeneratorToolExecution:
             lesson_number=2,
         )
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_result_sent_back_to_api(self, mock_anthropic_class):
+    async def test_tool_result_sent_back_to_api(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
         """Test that tool results are sent back to API correctly"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool_block = MagicMock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.id = "tool_xyz"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.input = {"query": "test"}
-        mock_tool_response.content = [mock_tool_block]
-
-        mock_final_response = MagicMock()
-        mock_final_response.stop_reason = "end_turn"
-        mock_final_content = MagicMock()
-        mock_final_content.text = "Final"
-        mock_final_response.content = [mock_final_content]
-
-        mock_client.messages.create.side_effect = [
+        mock_tool_response = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_xyz",
+                    name="search_course_content",
+                    input={"query": "test"},
+                ),
+            ),
+        )
+
+        mockfinal_response = final_response("Final")
+
+        mock_client.messages.responses = [
             mock_tool_response,
-            mock_final_response,
+            mockfinal_response,
         ]
 
-        mock_tool_manager = MagicMock()
         mock_tool_manager.execute_tool.return_value = "Search found: MCP content"
 
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        generator.generate_response(
+        await generator.generate_response(
             query="Query",
-            tools=[{"name": "search_course_content"}],
+            tools=search_tools,
             tool_manager=mock_tool_manager,
         )
 
         # Check second API call includes tool result
-        second_call = mock_client.messages.create.call_args_list[1]
-        messages = second_call.kwargs.get("messages", [])
+        [tool_result] = _tool_results(mock_client.messages.calls[1].kwargs["messages"])
+        assert tool_result["tool_use_id"] == "tool_xyz"
+        assert tool_result["content"] == "Search found: MCP content"
+
+    async def test_tool_round_leaves_caller_history_untouched(
+        self, mock_client, generator, search_tools, mock_tool_manager
+    ):
+        """Test that extending messages in place never reaches the caller's list"""
+        mock_client.messages.responses = [
+            multi_tool_response(("t1", "search_course_content", {})),
+            final_response("Answer"),
+        ]
+        history = [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello"},
+        ]
+        snapshot = [dict(message) for message in history]
+
+        await generator.generate_response(
+            query="Query",
+            conversation_history=history,
+            tools=search_tools,
+            tool_manager=mock_tool_manager,
+        )
+
+        assert history == snapshot
+
+    async def test_tool_round_with_fixture_responses(
+        self,
+        mock_client,
+        generator,
+        mock_anthropic_response_tool_use,
+        mock_anthropic_final_response,
+        mock_tool_manager,
+        search_tools,
+    ):
+        """Test a full tool round using the shared dataclass responses"""
+        mock_client.messages.responses = [
+            mock_anthropic_response_tool_use,
+            mock_anthropic_final_response,
+        ]
+        mock_tool_manager.execute_tool.return_value = "MCP course content"
 
-        # Find tool_result message
-        tool_result_message = None
-        for msg in messages:
-            if msg.get("role") == "user" and isinstance(msg.get("content"), list):
-                for content in msg["content"]:
-                    if content.get("type") == "tool_result":
-                        tool_result_message = content
-                        break
+        result = await generator.generate_response(
+            query="What is MCP?",
+            tools=search_tools,
+            tool_manager=mock_tool_manager,
+        )
 
-        assert tool_result_message is not None
-        assert tool_result_message["tool_use_id"] == "tool_xyz"
-        assert tool_result_message["content"] == "Search found: MCP content"
+        assert result == mock_anthropic_final_response.content[0].text
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content",
+            query="What is MCP?",
+            course_name="Introduction to MCP",
+        )
 
 
 class TestAIGeneratorMultipleToolCalls:
     """Tests for handling multiple tool calls in one response"""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_handles_multiple_tool_calls(self, mock_anthropic_class):
+    async def test_handles_multiple_tool_calls(
+        self, mock_client, generator, mock_tool_manager
+    ):
         """Test that multiple tool calls in one response are all executed"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
         # Response with two tool calls
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-
-        mock_tool_1 = MagicMock()
-        mock_tool_1.type = "tool_use"
-        mock_tool_1.id = "tool_1"
-        mock_tool_1.name = "search_course_content"
-        mock_tool_1.input = {"query": "query 1"}
-
-        mock_tool_2 = MagicMock()
-        mock_tool_2.type = "tool_use"
-        mock_tool_2.id = "tool_2"
-        mock_tool_2.name = "get_course_outline"
-        mock_tool_2.input = {"course_name": "MCP"}
-
-        mock_tool_response.content = [mock_tool_1, mock_tool_2]
-
-        mock_final_response = MagicMock()
-        mock_final_response.stop_reason = "end_turn"
-        mock_final_content = MagicMock()
-        mock_final_content.text = "Combined answer"
-        mock_final_response.content = [mock_final_content]
-
-        mock_client.messages.create.side_effect = [
+        mock_tool_response = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_1",
+                    name="search_course_content",
+                    input={"query": "query 1"},
+                ),
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_2",
+                    name="get_course_outline",
+                    input={"course_name": "MCP"},
+                ),
+            ),
+        )
+
+        mockfinal_response = final_response("Combined answer")
+
+        mock_client.messages.responses = [
             mock_tool_response,
-            mock_final_response,
+            mockfinal_response,
         ]
 
-        mock_tool_manager = MagicMock()
         mock_tool_manager.execute_tool.side_effect = ["Result 1", "Result 2"]
 
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
-        result = generator.generate_response(
+        result = await generator.generate_response(
             query="Query",
             tools=[{"name": "search_course_content"}, {"name": "get_course_outline"}],
             tool_manager=mock_tool_manager,
@@ -301,38 +382,262 @@ class TestAIGeneratorMultipleToolCalls:
         assert mock_tool_manager.execute_tool.call_count == 2
         assert result == "Combined answer"
 
+    async def test_multiple_tool_results_keep_block_order(
+        self, mock_client, generator, mock_tool_manager
+    ):
+        """Test that concurrently executed tool results match their tool_use ids"""
+
+        mock_tool_response = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_1",
+                    name="search_course_content",
+                    input={"query": "query 1"},
+                ),
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_2",
+                    name="get_course_outline",
+                    input={"course_name": "MCP"},
+                ),
+            ),
+        )
+
+        mockfinal_response = final_response("Combined answer")
+
+        mock_client.messages.responses = [
+            mock_tool_response,
+            mockfinal_response,
+        ]
+
+        mock_tool_manager.execute_tool.side_effect = (
+            lambda name, **kwargs: f"{name} output"
+        )
+
+        await generator.generate_response(
+            query="Query",
+            tools=[{"name": "search_course_content"}, {"name": "get_course_outline"}],
+            tool_manager=mock_tool_manager,
+        )
+
+        tool_results = _tool_results(mock_client.messages.calls[1].kwargs["messages"])
+        assert [(r["tool_use_id"], r["content"]) for r in tool_results] == [
+            ("tool_1", "search_course_content output"),
+            ("tool_2", "get_course_outline output"),
+        ]
+
+
+@pytest.mark.slow
+class TestAIGeneratorConcurrentToolCalls:
+    """Tests for concurrent execution of tool calls within one round"""
+
+    async def test_different_tools_run_concurrently(
+        self, mock_client, generator, mock_tool_manager
+    ):
+        """Test that calls to different tools overlap in time"""
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("tool_1", "search_course_content", {"query": "q"}),
+                ("tool_2", "get_course_outline", {"course_name": "MCP"}),
+            ),
+            final_response("Done"),
+        ]
+
+        # Each call waits for the other; a serial loop breaks the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def execute_tool(name, **kwargs):
+            barrier.wait()
+            return f"{name} output"
+
+        mock_tool_manager.execute_tool.side_effect = execute_tool
+
+        result = await generator.generate_response(
+            query="Query",
+            tools=[{"name": "search_course_content"}, {"name": "get_course_outline"}],
+            tool_manager=mock_tool_manager,
+        )
+
+        assert result == "Done"
+        assert mock_tool_manager.execute_tool.call_count == 2
+
+    @patch.object(AIGenerator, "MAX_PENDING_TOOL_TASKS", 1)
+    async def test_tool_groups_capped_by_admission_semaphore(
+        self, mock_client, mock_tool_manager
+    ):
+        """Test that no more than MAX_PENDING_TOOL_TASKS groups run at once"""
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("tool_1", "search_course_content", {"query": "q"}),
+                ("tool_2", "get_course_outline", {"course_name": "MCP"}),
+            ),
+            final_response("Done"),
+        ]
+
+        lock = threading.Lock()
+        running = 0
+        peak = 0
+
+        def execute_tool(name, **kwargs):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return f"{name} output"
+
+        mock_tool_manager.execute_tool.side_effect = execute_tool
+
+        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
+        result = await generator.generate_response(
+            query="Query",
+            tools=[{"name": "search_course_content"}, {"name": "get_course_outline"}],
+            tool_manager=mock_tool_manager,
+        )
+
+        assert result == "Done"
+        assert mock_tool_manager.execute_tool.call_count == 2
+        assert peak == 1
+
+    async def test_same_tool_calls_run_serially_in_block_order(
+        self, mock_client, generator, mock_tool_manager
+    ):
+        """Test that repeated calls to one stateful tool never overlap"""
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("tool_1", "search_course_content", {"query": "first"}),
+                ("tool_2", "get_course_outline", {"course_name": "MCP"}),
+                ("tool_3", "search_course_content", {"query": "second"}),
+            ),
+            final_response("Done"),
+        ]
+
+        lock = threading.Lock()
+        active = {"search_course_content": 0}
+        max_active = {"search_course_content": 0}
+        search_order = []
+
+        def execute_tool(name, **kwargs):
+            if name != "search_course_content":
+                return "outline"
+            with lock:
+                active[name] += 1
+                max_active[name] = max(max_active[name], active[name])
+                search_order.append(kwargs["query"])
+            time.sleep(0.01)
+            with lock:
+                active[name] -= 1
+            return kwargs["query"]
+
+        mock_tool_manager.execute_tool.side_effect = execute_tool
+
+        await generator.generate_response(
+            query="Query",
+            tools=[{"name": "search_course_content"}, {"name": "get_course_outline"}],
+            tool_manager=mock_tool_manager,
+        )
+
+        assert max_active["search_course_content"] == 1
+        assert search_order == ["first", "second"]
+
+        tool_results = _tool_results(mock_client.messages.calls[1].kwargs["messages"])
+        assert [r["content"] for r in tool_results] == [
+            "first",
+            "outline",
+            "second",
+        ]
+
+    async def test_failure_in_one_of_several_tools_stops_loop(
+        self, mock_client, generator, mock_tool_manager
+    ):
+        """Test that one failing tool in a concurrent round reports an error"""
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("tool_1", "search_course_content", {"query": "q"}),
+                ("tool_2", "get_course_outline", {"course_name": "MCP"}),
+            )
+        ]
+
+        def execute_tool(name, **kwargs):
+            if name == "get_course_outline":
+                raise Exception("Outline unavailable")
+            return "Search output"
+
+        mock_tool_manager.execute_tool.side_effect = execute_tool
+
+        result = await generator.generate_response(
+            query="Query",
+            tools=[{"name": "search_course_content"}, {"name": "get_course_outline"}],
+            tool_manager=mock_tool_manager,
+        )
+
+        assert result == "Tool execution failed: Outline unavailable"
+        # Every call in the round is started; no follow-up API call is made
+        assert mock_tool_manager.execute_tool.call_count == 2
+        assert len(mock_client.messages.calls) == 1
+
+
+@pytest.mark.slow
+class TestAIGeneratorRequestConcurrency:
+    """Tests for bounding concurrent Anthropic requests"""
+
+    async def test_concurrent_requests_capped_by_semaphore(
+        self, mock_client, generator
+    ):
+        """Test that in-flight API calls never exceed the semaphore limit"""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def create(**kwargs):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return final_response("Response")
+
+        mock_client.messages.responses = [create]
+
+        generator._request_semaphore = asyncio.Semaphore(2)
+
+        results = await asyncio.gather(
+            *(generator.generate_response(query=f"Q{i}") for i in range(5))
+        )
+
+        assert results == ["Response"] * 5
+        assert max_in_flight == 2
+
 
 class TestAIGeneratorNoToolManager:
     """Tests for behavior when no tool_manager is provided"""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_returns_empty_response_when_tool_use_without_manager(
-        self, mock_anthropic_class
+    async def test_returns_empty_response_when_tool_use_without_manager(
+        self, mock_client, generator, search_tools
     ):
         """Test behavior when tool_use happens but no tool_manager provided"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
         # Response requests tool use
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_text = MagicMock()
-        mock_text.type = "text"
-        mock_text.text = "I need to search for this."
-        mock_tool_block = MagicMock()
-        mock_tool_block.type = "tool_use"
-        mock_tool_block.id = "tool_123"
-        mock_tool_block.name = "search_course_content"
-        mock_tool_block.input = {"query": "test"}
-        mock_tool_response.content = [mock_text, mock_tool_block]
-
-        mock_client.messages.create.return_value = mock_tool_response
+        mock_tool_response = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(type="text", text="I need to search for this."),
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_123",
+                    name="search_course_content",
+                    input={"query": "test"},
+                ),
+            ),
+        )
 
-        generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
+        mock_client.messages.responses = [mock_tool_response]
 
         # Without tool_manager, should return the text content
-        result = generator.generate_response(
-            query="Query", tools=[{"name": "search_course_content"}], tool_manager=None
+        result = await generator.generate_response(
+            query="Query", tools=search_tools, tool_manager=None
         )
 
         # Current implementation returns first content's text
@@ -343,137 +648,74 @@ class TestAIGeneratorNoToolManager:
 class TestAIGeneratorAPIParameters:
     """Tests for correct API parameter configuration"""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_uses_correct_model(self, mock_anthropic_class):
-        """Test that the configured model is used"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Response"
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
-
-        generator = AIGenerator(api_key="test_key", model="claude-sonnet-4-20250514")
-        generator.generate_response(query="Test")
-
-        call_args = mock_client.messages.create.call_args
-        assert call_args.kwargs.get("model") == "claude-sonnet-4-20250514"
-
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_uses_correct_max_tokens(self, mock_anthropic_class):
-        """Test that max_tokens is set correctly"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Response"
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
-
-        generator = AIGenerator(api_key="test_key", model="test-model")
-        generator.generate_response(query="Test")
-
-        call_args = mock_client.messages.create.call_args
-        assert call_args.kwargs.get("max_tokens") == 800
-
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_uses_zero_temperature(self, mock_anthropic_class):
-        """Test that temperature is set to 0 for deterministic responses"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Response"
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
-
-        generator = AIGenerator(api_key="test_key", model="test-model")
-        generator.generate_response(query="Test")
-
-        call_args = mock_client.messages.create.call_args
-        assert call_args.kwargs.get("temperature") == 0
-
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_system_prompt_includes_key_instructions(self, mock_anthropic_class):
-        """Test that system prompt contains necessary instructions"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.stop_reason = "end_turn"
-        mock_content = MagicMock()
-        mock_content.text = "Response"
-        mock_response.content = [mock_content]
-        mock_client.messages.create.return_value = mock_response
-
-        generator = AIGenerator(api_key="test_key", model="test-model")
-        generator.generate_response(query="Test")
-
-        call_args = mock_client.messages.create.call_args
-        system = call_args.kwargs.get("system", "")
-
-        # Check for key instructions
-        assert "search_course_content" in system or "course" in system.lower()
-        assert "tool" in system.lower()
+    @pytest.mark.parametrize(
+        "key, check",
+        [
+            ("model", lambda v: v == "claude-3-sonnet"),
+            ("max_tokens", lambda v: v == 800),
+            # Deterministic responses
+            ("temperature", lambda v: v == 0),
+            ("system", lambda v: v[0]["cache_control"] == {"type": "ephemeral"}),
+            # Prompt carries the tool-use instructions
+            ("system", lambda v: _has_prompt_instructions(v[0]["text"])),
+        ],
+        ids=[
+            "model",
+            "max_tokens",
+            "temperature",
+            "system-cached",
+            "system-instructions",
+        ],
+    )
+    async def test_request_parameters(self, mock_client, generator, key, check):
+        """Test each configured request parameter on a plain query"""
+        mock_client.messages.responses = [final_response("Response")]
+
+        await generator.generate_response(query="Test")
+
+        assert check(mock_client.messages.calls[-1].kwargs[key])
+
+
+class TestAIGeneratorClientSetup:
+    """Tests for Anthropic client construction"""
+
+    async def test_client_uses_persistent_http2_pool(self, patched_anthropic):
+        """Test that the SDK client is given a shared HTTP/2 httpx client"""
+        AIGenerator(api_key="test_key", model="test-model")
+
+        call_kwargs = patched_anthropic.call_args.kwargs
+        assert call_kwargs["api_key"] == "test_key"
+        assert isinstance(call_kwargs["http_client"], httpx.AsyncClient)
+        await call_kwargs["http_client"].aclose()
 
 
 class TestAIGeneratorSequentialToolCalls:
     """Tests for sequential tool calling (up to 2 rounds)"""
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_two_sequential_tool_calls_succeed(self, mock_anthropic_class):
+    async def test_two_sequential_tool_calls_succeed(
+        self, mock_client, generator, mock_tool_manager
+    ):
         """Test that two sequential tool calls work correctly"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        # Round 1: First tool use
-        mock_response_1 = MagicMock()
-        mock_response_1.stop_reason = "tool_use"
-        mock_tool_1 = MagicMock()
-        mock_tool_1.type = "tool_use"
-        mock_tool_1.id = "tool_round1"
-        mock_tool_1.name = "get_course_outline"
-        mock_tool_1.input = {"course_name": "MCP"}
-        mock_response_1.content = [mock_tool_1]
-
-        # Round 2: Second tool use
-        mock_response_2 = MagicMock()
-        mock_response_2.stop_reason = "tool_use"
-        mock_tool_2 = MagicMock()
-        mock_tool_2.type = "tool_use"
-        mock_tool_2.id = "tool_round2"
-        mock_tool_2.name = "search_course_content"
-        mock_tool_2.input = {"query": "lesson 2 details", "course_name": "MCP"}
-        mock_response_2.content = [mock_tool_2]
-
-        # Final response after max rounds
-        mock_final = MagicMock()
-        mock_final.stop_reason = "end_turn"
-        mock_final_text = MagicMock()
-        mock_final_text.text = "Here is the comprehensive answer."
-        mock_final.content = [mock_final_text]
-
-        mock_client.messages.create.side_effect = [
-            mock_response_1,
-            mock_response_2,
-            mock_final,
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("tool_round1", "get_course_outline", {"course_name": "MCP"})
+            ),
+            multi_tool_response(
+                (
+                    "tool_round2",
+                    "search_course_content",
+                    {"query": "lesson 2 details", "course_name": "MCP"},
+                )
+            ),
+            # Final response after max rounds
+            final_response("Here is the comprehensive answer."),
         ]
-
-        mock_tool_manager = MagicMock()
         mock_tool_manager.execute_tool.side_effect = [
             "Course outline: Lesson 1, Lesson 2",
             "Lesson 2 content details",
         ]
 
-        generator = AIGenerator(api_key="test", model="test-model")
-        result = generator.generate_response(
+        result = await generator.generate_response(
             query="Tell me about MCP lesson 2",
             tools=[{"name": "get_course_outline"}, {"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
@@ -482,156 +724,173 @@ class TestAIGeneratorSequentialToolCalls:
         # Verify 2 tool executions
         assert mock_tool_manager.execute_tool.call_count == 2
         # Verify 3 API calls (2 tool rounds + 1 final)
-        assert mock_client.messages.create.call_count == 3
+        assert len(mock_client.messages.calls) == 3
         assert result == "Here is the comprehensive answer."
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_stops_after_first_round_if_no_tool_use(self, mock_anthropic_class):
+    async def test_stops_after_first_round_if_no_tool_use(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
         """Test that loop exits early if Claude doesn't request tool use"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        # First call uses tool
-        mock_response_1 = MagicMock()
-        mock_response_1.stop_reason = "tool_use"
-        mock_tool = MagicMock()
-        mock_tool.type = "tool_use"
-        mock_tool.id = "tool_1"
-        mock_tool.name = "search_course_content"
-        mock_tool.input = {"query": "test"}
-        mock_response_1.content = [mock_tool]
-
-        # Second call returns text (no more tools needed)
-        mock_response_2 = MagicMock()
-        mock_response_2.stop_reason = "end_turn"
-        mock_text = MagicMock()
-        mock_text.text = "Final answer after one tool."
-        mock_response_2.content = [mock_text]
-
-        mock_client.messages.create.side_effect = [mock_response_1, mock_response_2]
-
-        mock_tool_manager = MagicMock()
-        mock_tool_manager.execute_tool.return_value = "Tool result"
-
-        generator = AIGenerator(api_key="test", model="test-model")
-        result = generator.generate_response(
-            query="Query",
-            tools=[{"name": "search_course_content"}],
-            tool_manager=mock_tool_manager,
+        mock_client.messages.responses = [
+            multi_tool_response(("tool_1", "search_course_content", {"query": "test"})),
+            final_response("Final answer after one tool."),
+        ]
+
+        result = await generator.generate_response(
+            query="Query", tools=search_tools, tool_manager=mock_tool_manager
         )
 
         # Only 1 tool execution, 2 API calls
         assert mock_tool_manager.execute_tool.call_count == 1
-        assert mock_client.messages.create.call_count == 2
+        assert len(mock_client.messages.calls) == 2
         assert result == "Final answer after one tool."
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tool_failure_stops_loop(self, mock_anthropic_class):
+    async def test_tool_failure_stops_loop(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
         """Test that tool failure terminates the loop"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_response = MagicMock()
-        mock_response.stop_reason = "tool_use"
-        mock_tool = MagicMock()
-        mock_tool.type = "tool_use"
-        mock_tool.id = "tool_fail"
-        mock_tool.name = "search_course_content"
-        mock_tool.input = {"query": "test"}
-        mock_response.content = [mock_tool]
-
-        mock_client.messages.create.return_value = mock_response
-
-        mock_tool_manager = MagicMock()
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("tool_fail", "search_course_content", {"query": "test"})
+            ),
+        ]
         mock_tool_manager.execute_tool.side_effect = Exception("Connection error")
 
-        generator = AIGenerator(api_key="test", model="test-model")
-        result = generator.generate_response(
-            query="Query",
-            tools=[{"name": "search_course_content"}],
-            tool_manager=mock_tool_manager,
+        result = await generator.generate_response(
+            query="Query", tools=search_tools, tool_manager=mock_tool_manager
         )
 
         assert "Tool execution failed" in result
         # Only 1 API call before failure
-        assert mock_client.messages.create.call_count == 1
+        assert len(mock_client.messages.calls) == 1
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_max_rounds_forces_final_response(self, mock_anthropic_class):
+    async def test_max_rounds_forcesfinal_response(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
         """Test that reaching max rounds forces a text response"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
         # Both rounds request tools
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool = MagicMock()
-        mock_tool.type = "tool_use"
-        mock_tool.id = "tool_x"
-        mock_tool.name = "search_course_content"
-        mock_tool.input = {"query": "test"}
-        mock_tool_response.content = [mock_tool]
-
-        mock_final = MagicMock()
-        mock_final.stop_reason = "end_turn"
-        mock_text = MagicMock()
-        mock_text.text = "Forced final response"
-        mock_final.content = [mock_text]
-
-        mock_client.messages.create.side_effect = [
-            mock_tool_response,
-            mock_tool_response,
-            mock_final,
+        mock_client.messages.responses = [
+            multi_tool_response(("tool_1", "search_course_content", {"query": "a"})),
+            multi_tool_response(("tool_2", "search_course_content", {"query": "b"})),
+            final_response("Forced final response"),
         ]
 
-        mock_tool_manager = MagicMock()
-        mock_tool_manager.execute_tool.return_value = "Result"
-
-        generator = AIGenerator(api_key="test", model="test-model")
-        result = generator.generate_response(
-            query="Query",
-            tools=[{"name": "search_course_content"}],
-            tool_manager=mock_tool_manager,
+        result = await generator.generate_response(
+            query="Query", tools=search_tools, tool_manager=mock_tool_manager
         )
 
         # Verify tool_choice was set to "none" on final call
-        final_call = mock_client.messages.create.call_args_list[-1]
-        assert final_call.kwargs.get("tool_choice") == {"type": "none"}
+        final_call = mock_client.messages.calls[-1]
+        assert final_call.kwargs["tool_choice"] == {"type": "none"}
         assert result == "Forced final response"
 
-    @patch("ai_generator.anthropic.Anthropic")
-    def test_tools_remain_available_in_second_round(self, mock_anthropic_class):
-        """Test that tools are included in the second API call"""
-        mock_client = MagicMock()
-        mock_anthropic_class.return_value = mock_client
-
-        mock_tool_response = MagicMock()
-        mock_tool_response.stop_reason = "tool_use"
-        mock_tool = MagicMock()
-        mock_tool.type = "tool_use"
-        mock_tool.id = "tool_1"
-        mock_tool.name = "search_course_content"
-        mock_tool.input = {"query": "test"}
-        mock_tool_response.content = [mock_tool]
-
-        mock_final = MagicMock()
-        mock_final.stop_reason = "end_turn"
-        mock_text = MagicMock()
-        mock_text.text = "Done"
-        mock_final.content = [mock_text]
+    async def test_max_rounds_ignores_lead_in_text_from_tool_turn(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
+        """Test that text written before the last tool calls is not the answer"""
+        tool_turn = MockMessage(
+            stop_reason="tool_use",
+            content=(
+                MockContentBlock(type="text", text="Let me look that up."),
+                MockContentBlock(
+                    type="tool_use",
+                    id="tool_x",
+                    name="search_course_content",
+                    input={"query": "test"},
+                ),
+            ),
+        )
+        mock_client.messages.responses = [
+            tool_turn,
+            tool_turn,
+            final_response("Answer based on the tool results"),
+        ]
 
-        mock_client.messages.create.side_effect = [mock_tool_response, mock_final]
+        result = await generator.generate_response(
+            query="Query", tools=search_tools, tool_manager=mock_tool_manager
+        )
 
-        mock_tool_manager = MagicMock()
-        mock_tool_manager.execute_tool.return_value = "Result"
+        # The forced final call still sees the last round's tool results
+        assert len(mock_client.messages.calls) == 3
+        final_call = mock_client.messages.calls[-1]
+        assert final_call.kwargs["tool_choice"] == {"type": "none"}
+        assert final_call.kwargs["messages"][-1]["content"][0]["type"] == (
+            "tool_result"
+        )
+        assert result == "Answer based on the tool results"
 
+    async def test_tools_remain_available_in_second_round(
+        self, mock_client, generator, mock_tool_manager
+    ):
+        """Test that tools are included in the second API call"""
+        mock_client.messages.responses = [
+            multi_tool_response(("tool_1", "search_course_content", {"query": "test"})),
+            final_response("Done"),
+        ]
         tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
 
-        generator = AIGenerator(api_key="test", model="test-model")
-        generator.generate_response(
+        await generator.generate_response(
             query="Query", tools=tools, tool_manager=mock_tool_manager
         )
 
         # Check second call still has tools
-        second_call = mock_client.messages.create.call_args_list[1]
-        assert second_call.kwargs.get("tools") == tools
+        second_call_tools = mock_client.messages.calls[1].kwargs["tools"]
+        assert [t["name"] for t in second_call_tools] == [t["name"] for t in tools]
+        assert second_call_tools[-1]["cache_control"] == {"type": "ephemeral"}
+
+
+class TestAIGeneratorRepeatedToolCalls:
+    """Tests for reusing outputs of repeated identical tool calls"""
+
+    async def test_repeat_call_in_later_round_reuses_output(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
+        """Test that a call repeated in round two is answered without re-running"""
+        search = ("search_course_content", {"query": "MCP", "lesson_number": 1})
+        mock_client.messages.responses = [
+            multi_tool_response(("t1", *search)),
+            multi_tool_response(("t2", *search)),
+            final_response("Answer"),
+        ]
+        mock_tool_manager.execute_tool.return_value = "Lesson 1 content"
+
+        result = await generator.generate_response(
+            query="What is MCP?",
+            tools=search_tools,
+            tool_manager=mock_tool_manager,
+        )
+
+        assert result == "Answer"
+        mock_tool_manager.execute_tool.assert_called_once()
+        final_messages = mock_client.messages.calls[-1].kwargs["messages"]
+        assert final_messages[-1]["content"] == [
+            {"type": "tool_result", "tool_use_id": "t2", "content": "Lesson 1 content"}
+        ]
+
+    async def test_duplicate_calls_in_one_round_run_once(
+        self, mock_client, generator, mock_tool_manager, search_tools
+    ):
+        """Test that identical calls in one response share a single execution"""
+        mock_client.messages.responses = [
+            multi_tool_response(
+                ("t1", "search_course_content", {"query": "a", "course_name": "X"}),
+                ("t2", "search_course_content", {"course_name": "X", "query": "a"}),
+                ("t3", "search_course_content", {"query": "b"}),
+            ),
+            final_response("Answer"),
+        ]
+        mock_tool_manager.execute_tool.side_effect = lambda name, **kw: kw["query"]
+
+        await generator.generate_response(
+            query="Query",
+            tools=search_tools,
+            tool_manager=mock_tool_manager,
+        )
+
+        assert mock_tool_manager.execute_tool.call_count == 2
+        tool_results = _tool_results(mock_client.messages.calls[-1].kwargs["messages"])
+        assert [(r["tool_use_id"], r["content"]) for r in tool_results] == [
+            ("t1", "a"),
+            ("t2", "a"),
+            ("t3", "b"),
+        ]
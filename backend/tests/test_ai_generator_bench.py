@@ -0,0 +1,84 @@
+"""
+Benchmarks for AIGenerator in ai_generator.py
+
+These time the generate_response control flow (tool loop, message list
+construction, tool dispatch) against a scripted client, so they catch
+slowdowns in the generator itself without any network. Timing only runs
+in-process (``./scripts/check.sh bench``); under xdist pytest-benchmark
+disables itself and each case runs once as a plain test.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import create_autospec
+
+from ai_generator import AIGenerator
+from search_tools import ToolManager
+from tests.fakes import final_response, multi_tool_response
+
+# Two tool rounds followed by the forced final answer
+TWO_ROUND_SCRIPT = (
+    multi_tool_response(
+        ("tool_1", "get_course_outline", {"course_name": "MCP"}),
+    ),
+    multi_tool_response(
+        ("tool_2", "search_course_content", {"query": "lesson 4"}),
+        ("tool_3", "search_course_content", {"query": "lesson 5"}),
+    ),
+    final_response("Lessons 4 and 5 cover MCP servers."),
+)
+
+
+@pytest.fixture
+def event_loop_runner():
+    """Dedicated event loop so the sync benchmark fixture can drive coroutines"""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.mark.benchmark(group="generate_response")
+def test_generate_response_two_tool_rounds(benchmark, mock_client, event_loop_runner):
+    """Benchmark a full two-round tool loop on the scripted client"""
+    generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
+    tool_manager = create_autospec(ToolManager, instance=True)
+    tool_manager.execute_tool.return_value = "Tool result"
+    tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
+    mock_client.messages.responses = list(TWO_ROUND_SCRIPT)
+
+    def run():
+        # The script replays by call count, so clearing restarts it
+        mock_client.messages.calls.clear()
+        return event_loop_runner(
+            generator.generate_response(
+                query="What do lessons 4 and 5 of MCP cover?",
+                tools=tools,
+                tool_manager=tool_manager,
+            )
+        )
+
+    result = benchmark(run)
+
+    assert result == "Lessons 4 and 5 cover MCP servers."
+    assert len(mock_client.messages.calls) == 3
+
+
+@pytest.mark.benchmark(group="generate_response")
+def test_generate_response_direct(benchmark, mock_client, event_loop_runner):
+    """Benchmark a single end_turn call with conversation history"""
+    generator = AIGenerator(api_key="test_key", model="claude-3-sonnet")
+    mock_client.messages.responses = [final_response("Direct answer")]
+    history = [
+        {"role": "user", "content": "What is MCP?"},
+        {"role": "assistant", "content": "MCP is Model Context Protocol."},
+    ]
+
+    def run():
+        mock_client.messages.calls.clear()
+        return event_loop_runner(
+            generator.generate_response(query="Follow up", conversation_history=history)
+        )
+
+    result = benchmark(run)
+
+    assert result == "Direct answer"
@@ -8,38 +8,70 @@ These tests use real components (not mocks) to identify integration issues:
 """
 
 import pytest
-import tempfile
-import shutil
-import os
+import resource
 import sys
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from vector_store import VectorStore, SearchResults
 from search_tools import CourseSearchTool, CourseOutlineTool, ToolManager
 from models import Course, Lesson, CourseChunk
 
 
+# Loading the embedding model and opening ChromaDB dominate these tests, so
+# one store is shared by the whole module. Fixtures that load data clear it
+# first, which keeps each class (and each mutating test) isolated.
+@pytest.fixture(scope="module")
+def vector_store(chroma_client, shared_embedding_fn):
+    """Create a real VectorStore backed by in-memory ChromaDB"""
+    return VectorStore(
+        chroma_path=None,
+        embedding_model="all-MiniLM-L6-v2",
+        max_results=5,
+        embedding_function=shared_embedding_fn,
+        client=chroma_client,
+    )
+
+
+# Peak memory an integration class may add once the shared model and client
+# are loaded; more than this means something is reloading or leaking them
+MAX_CLASS_RSS_GROWTH_MB = 200
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+@pytest.fixture(scope="class", autouse=True)
+def bounded_memory_growth(request):
+    """Fail an integration class whose tests grow peak memory past the limit"""
+    if request.node.get_closest_marker("integration") is None:
+        yield
+        return
+
+    # Load the shared store first so its one-time cost isn't counted
+    request.getfixturevalue("vector_store")
+    before = _peak_rss_mb()
+    yield
+    growth = _peak_rss_mb() - before
+    assert growth < MAX_CLASS_RSS_GROWTH_MB, (
+        f"{request.node.name} grew peak RSS by {growth:.0f} MB "
+        f"(limit {MAX_CLASS_RSS_GROWTH_MB} MB)"
+    )
+
+
+@pytest.mark.integration
 class TestVectorStoreIntegration:
     """Integration tests for VectorStore with real ChromaDB"""
 
-    @pytest.fixture
-    def temp_chroma_path(self):
-        """Create a temporary directory for ChromaDB"""
-        temp_dir = tempfile.mkdtemp()
-        yield temp_dir
-        shutil.rmtree(temp_dir)
-
-    @pytest.fixture
-    def vector_store(self, temp_chroma_path):
-        """Create a real VectorStore with temporary storage"""
-        return VectorStore(
-            chroma_path=temp_chroma_path,
-            embedding_model="all-MiniLM-L6-v2",
-            max_results=5,
-        )
+    @pytest.fixture(autouse=True)
+    def empty_vector_store(self, vector_store):
+        """Start every test from empty collections"""
+        vector_store.clear_all_data()
 
-    @pytest.fixture
+    # Pure data shared by the whole class; tests only read it
+    @pytest.fixture(scope="class")
     def sample_course(self):
         """Create a sample course for testing"""
         return Course(
@@ -65,10 +97,10 @@ class TestVectorStoreIntegration:
             ],
         )
 
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def sample_chunks(self, sample_course):
         """Create sample course chunks for testing"""
-        return [
+        return (
             CourseChunk(
                 content="MCP stands for Model Context Protocol. It allows AI models to interact with external tools and data sources.",
                 course_title=sample_course.title,
@@ -87,7 +119,7 @@ class TestVectorStoreIntegration:
                 lesson_number=3,
                 chunk_index=2,
             ),
-        ]
+        )
 
     def test_add_and_search_course_content(
         self, vector_store, sample_course, sample_chunks
@@ -161,6 +193,10 @@ class TestVectorStoreIntegration:
         assert results.error is not None
         assert "No course found" in results.error
 
+    def test_uses_injected_embedding_function(self, vector_store, shared_embedding_fn):
+        """Test that a passed-in embedding function replaces the default one"""
+        assert vector_store.embedding_function is shared_embedding_fn
+
     def test_get_lesson_link(self, vector_store, sample_course):
         """Test getting lesson link from course metadata"""
         vector_store.add_course_metadata(sample_course)
@@ -179,26 +215,14 @@ class TestVectorStoreIntegration:
         assert link is None
 
 
+@pytest.mark.integration
 class TestCourseSearchToolIntegration:
     """Integration tests for CourseSearchTool with real VectorStore"""
 
-    @pytest.fixture
-    def temp_chroma_path(self):
-        temp_dir = tempfile.mkdtemp()
-        yield temp_dir
-        shutil.rmtree(temp_dir)
-
-    @pytest.fixture
-    def vector_store(self, temp_chroma_path):
-        return VectorStore(
-            chroma_path=temp_chroma_path,
-            embedding_model="all-MiniLM-L6-v2",
-            max_results=5,
-        )
-
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def populated_vector_store(self, vector_store):
-        """Vector store with sample data"""
+        """Vector store with sample data (loaded once; tests only search)"""
+        vector_store.clear_all_data()
         course = Course(
             title="Python Basics",
             course_link="https://example.com/python",
@@ -259,23 +283,14 @@ class TestCourseSearchToolIntegration:
         assert "No course found" in result
 
 
+@pytest.mark.integration
 class TestToolManagerIntegration:
     """Integration tests for ToolManager with real tools"""
 
-    @pytest.fixture
-    def temp_chroma_path(self):
-        temp_dir = tempfile.mkdtemp()
-        yield temp_dir
-        shutil.rmtree(temp_dir)
-
-    @pytest.fixture
-    def tool_manager_with_data(self, temp_chroma_path):
-        """Create ToolManager with populated VectorStore"""
-        vector_store = VectorStore(
-            chroma_path=temp_chroma_path,
-            embedding_model="all-MiniLM-L6-v2",
-            max_results=5,
-        )
+    @pytest.fixture(scope="class")
+    def vector_store_with_data(self, vector_store):
+        """Vector store with one course (loaded once; tests only search)"""
+        vector_store.clear_all_data()
 
         # Add sample data
         course = Course(
@@ -299,14 +314,23 @@ class TestToolManagerIntegration:
         ]
         vector_store.add_course_metadata(course)
         vector_store.add_course_content(chunks)
+        return vector_store
 
-        # Create manager with tools
+    @pytest.fixture(scope="class")
+    def class_tool_manager(self, vector_store_with_data):
+        """ToolManager with both tools registered, built once per class"""
         manager = ToolManager()
-        manager.register_tool(CourseSearchTool(vector_store))
-        manager.register_tool(CourseOutlineTool(vector_store))
+        manager.register_tool(CourseSearchTool(vector_store_with_data))
+        manager.register_tool(CourseOutlineTool(vector_store_with_data))
 
         return manager
 
+    @pytest.fixture
+    def tool_manager_with_data(self, class_tool_manager):
+        """Shared ToolManager with sources from earlier tests cleared"""
+        class_tool_manager.reset_sources()
+        return class_tool_manager
+
     def test_execute_search_tool_through_manager(self, tool_manager_with_data):
         """Test executing search tool through manager"""
         result = tool_manager_with_data.execute_tool(
@@ -335,23 +359,14 @@ class TestToolManagerIntegration:
         assert len(sources) == 0
 
 
+@pytest.mark.integration
 class TestCourseOutlineToolIntegration:
     """Integration tests for CourseOutlineTool"""
 
-    @pytest.fixture
-    def temp_chroma_path(self):
-        temp_dir = tempfile.mkdtemp()
-        yield temp_dir
-        shutil.rmtree(temp_dir)
-
-    @pytest.fixture
-    def vector_store_with_course(self, temp_chroma_path):
+    @pytest.fixture(scope="class")
+    def vector_store_with_course(self, vector_store):
         """Vector store with a course for outline testing"""
-        vector_store = VectorStore(
-            chroma_path=temp_chroma_path,
-            embedding_model="all-MiniLM-L6-v2",
-            max_results=5,
-        )
+        vector_store.clear_all_data()
 
         course = Course(
             title="Advanced Python",
@@ -407,29 +422,48 @@ class TestCourseOutlineToolIntegration:
 class TestSearchResultsEdgeCases:
     """Test edge cases in search results handling"""
 
-    def test_search_results_from_chroma_with_empty_lists(self):
-        """Test handling of empty ChromaDB results"""
-        chroma_results = {"documents": [[]], "metadatas": [[]], "distances": [[]]}
-        results = SearchResults.from_chroma(chroma_results)
+    @pytest.mark.parametrize(
+        "build, expected_error",
+        [
+            (
+                lambda: SearchResults.from_chroma(
+                    {"documents": [[]], "metadatas": [[]], "distances": [[]]}
+                ),
+                None,
+            ),
+            # ChromaDB can return None-like values; these must not raise
+            (
+                lambda: SearchResults.from_chroma(
+                    {"documents": None, "metadatas": None, "distances": None}
+                ),
+                None,
+            ),
+            (
+                lambda: SearchResults.empty("Custom error message"),
+                "Custom error message",
+            ),
+        ],
+        ids=["chroma-empty-lists", "chroma-none-values", "empty-constructor"],
+    )
+    def test_empty_search_results(self, build, expected_error):
+        """Test that each way of building empty results is empty and well-formed"""
+        results = build()
 
         assert results.is_empty()
-        assert len(results.documents) == 0
-
-    def test_search_results_from_chroma_with_none_values(self):
-        """Test handling when ChromaDB returns None-like values"""
-        chroma_results = {"documents": None, "metadatas": None, "distances": None}
+        assert results.documents == []
+        assert results.error == expected_error
 
-        # This should handle None gracefully
-        try:
-            results = SearchResults.from_chroma(chroma_results)
-            assert results.is_empty()
-        except TypeError:
-            # If it raises TypeError, that's a bug to fix
-            pytest.fail("SearchResults.from_chroma doesn't handle None values properly")
+    def test_search_results_from_chroma_unwraps_single_query(self):
+        """Test that results for the one query sent are unwrapped in order"""
+        chroma_results = {
+            "documents": [["doc a", "doc b"]],
+            "metadatas": [[{"lesson_number": 1}, {"lesson_number": 2}]],
+            "distances": [[0.1, 0.4]],
+        }
 
-    def test_search_results_empty_constructor(self):
-        """Test creating empty results with error message"""
-        results = SearchResults.empty("Custom error message")
+        results = SearchResults.from_chroma(chroma_results)
 
-        assert results.is_empty()
-        assert results.error == "Custom error message"
+        assert results.documents == ["doc a", "doc b"]
+        assert results.metadata == [{"lesson_number": 1}, {"lesson_number": 2}]
+        assert results.distances == [0.1, 0.4]
+        assert results.error is None
@@ -3,17 +3,20 @@ Tests for RAG system content-query handling in rag_system.py
 
 These tests evaluate:
 1. Query flow through the RAG system
-2. Tool integration with AIGenerator
-3. Source retrieval and reset
+2. Tool registration and integration with AIGenerator
+3. Source retrieval, kept separate per query
 4. Session management during queries
 """
 
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch, Mock
-import sys
+from collections import namedtuple
+from unittest.mock import DEFAULT, Mock, patch
 import os
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag_system import RAGSystem
+from session_manager import SessionManager
+from vector_store import SearchResults, VectorStore
 
 
 class MockConfig:
@@ -29,433 +32,208 @@ class MockConfig:
     MAX_HISTORY = 2
 
 
-class TestRAGSystemQuery:
-    """Tests for RAGSystem.query() method"""
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_passes_tools_to_ai_generator(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that query() passes tool definitions to AIGenerator"""
-        from rag_system import RAGSystem
-
-        # Setup mocks
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "AI response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        # Create RAG system
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        # Execute query
-        rag.query("What is MCP?", session_id="test_session")
-
-        # Verify tools were passed
-        call_args = mock_ai_instance.generate_response.call_args
-        assert call_args.kwargs.get("tools") is not None
-        assert call_args.kwargs.get("tool_manager") is not None
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_retrieves_and_returns_sources(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that query() retrieves sources from tool_manager"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "AI response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_store_instance.search.return_value = MagicMock(
-            documents=["content"],
-            metadata=[{"course_title": "Test", "lesson_number": 1}],
-            distances=[0.1],
-            error=None,
-        )
-        mock_store_instance.get_lesson_link.return_value = "https://example.com"
-        mock_vector_store.return_value = mock_store_instance
+# RAGSystem collaborators replaced by mocks in every test
+PATCHED_COMPONENTS = (
+    "VectorStore",
+    "AIGenerator",
+    "DocumentProcessor",
+    "SessionManager",
+)
+
+# Read-only search results every test's VectorStore.search returns: one
+# chunk from a lesson with a link and one with no lesson number
+SEARCH_RESULTS = SearchResults(
+    documents=["content", "more content"],
+    metadata=[{"course_title": "Test", "lesson_number": 1}, {"course_title": "Test"}],
+    distances=[0.1, 0.2],
+)
+LESSON_URL = "https://example.com/lesson1"
+
+QUESTION = "What is MCP?"
+
+RAGMocks = namedtuple("RAGMocks", "rag ai_generator vector_store session_manager")
+
+
+class FakeAIGenerator:
+    """Stand-in for AIGenerator that records generate_response calls
+
+    Runs each (name, input) in ``tool_calls`` through the given tool_manager,
+    then returns ``response``, or raises ``error`` when one is set. Each
+    call's keyword arguments are appended to ``calls``.
+    """
+
+    def __init__(self, response="Response"):
+        self.response = response
+        self.error = None
+        self.tool_calls = ()
+        self.calls = []
+
+    async def generate_response(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.error is not None:
+            raise self.error
+        for name, tool_input in self.tool_calls:
+            kwargs["tool_manager"].execute_tool(name, **tool_input)
+        return self.response
+
+
+@pytest.fixture(scope="module", autouse=True)
+def no_chroma_on_disk():
+    """Fail if any test here creates MockConfig's ChromaDB directory
+
+    Tests must stay hermetic to run in parallel under xdist; with
+    VectorStore patched, nothing should ever touch CHROMA_PATH.
+    """
+    existed = os.path.exists(MockConfig.CHROMA_PATH)
+    yield
+    created = not existed and os.path.exists(MockConfig.CHROMA_PATH)
+    assert not created, f"RAGSystem tests created {MockConfig.CHROMA_PATH}"
+
+
+@pytest.fixture(scope="class")
+def patched_components():
+    """Patch RAGSystem's collaborator classes once for a whole test class"""
+    with patch.multiple(
+        "rag_system", **dict.fromkeys(PATCHED_COMPONENTS, DEFAULT)
+    ) as patched:
+        yield patched
+
+
+@pytest.fixture
+def rag_mocks(patched_components):
+    """RAGSystem built on freshly reset collaborator mocks"""
+    for mock_class in patched_components.values():
+        mock_class.reset_mock()
+
+    ai_generator = FakeAIGenerator()
+    vector_store = Mock(spec=VectorStore)
+    vector_store.search.return_value = SEARCH_RESULTS
+    vector_store.get_lesson_link.return_value = LESSON_URL
+    session_manager = Mock(spec=SessionManager)
+    session_manager.get_conversation_history.return_value = None
+    patched_components["AIGenerator"].return_value = ai_generator
+    patched_components["VectorStore"].return_value = vector_store
+    patched_components["SessionManager"].return_value = session_manager
+
+    return RAGMocks(
+        rag=RAGSystem(MockConfig()),
+        ai_generator=ai_generator,
+        vector_store=vector_store,
+        session_manager=session_manager,
+    )
 
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
 
-        config = MockConfig()
-        rag = RAGSystem(config)
+class TestRAGSystemQuery:
+    """Tests for RAGSystem.query() method"""
 
-        # Manually set sources on the search tool to simulate what happens after tool execution
-        rag.search_tool.last_sources = [
-            {"text": "Test - Lesson 1", "url": "https://example.com"}
+    async def test_query_offers_course_tools(self, rag_mocks):
+        """Test that both course tools and a manager to run them reach AIGenerator"""
+        await rag_mocks.rag.query(QUESTION, session_id="test")
+
+        call = rag_mocks.ai_generator.calls[-1]
+        assert {t["name"] for t in call["tools"]} == {
+            "search_course_content",
+            "get_course_outline",
+        }
+        assert call["tools"] == call["tool_manager"].get_tool_definitions()
+
+    async def test_query_wraps_question_in_prompt(self, rag_mocks):
+        """Test that the user query is wrapped in the instruction prompt"""
+        await rag_mocks.rag.query(QUESTION, session_id="test")
+
+        prompt = rag_mocks.ai_generator.calls[-1]["query"]
+        assert "course materials" in prompt
+        assert QUESTION in prompt
+
+    async def test_query_passes_session_history(self, rag_mocks):
+        """Test that the session's history is passed to AIGenerator"""
+        history = [
+            {"role": "user", "content": "Previous question"},
+            {"role": "assistant", "content": "Previous answer"},
         ]
+        rag_mocks.session_manager.get_conversation_history.return_value = history
 
-        response, sources = rag.query("What is MCP?")
-
-        assert sources is not None
-        assert len(sources) == 1
-        assert sources[0]["text"] == "Test - Lesson 1"
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_resets_sources_after_retrieval(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that sources are reset after being retrieved"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "AI response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        # Set sources
-        rag.search_tool.last_sources = [{"text": "Source 1", "url": None}]
-
-        rag.query("First query")
-
-        # Sources should be reset after query
-        assert len(rag.search_tool.last_sources) == 0
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_updates_session_history(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that query() updates conversation history"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "The answer is 42"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        rag.query("What is the meaning of life?", session_id="session_123")
-
-        # Verify add_exchange was called
-        mock_session_instance.add_exchange.assert_called_once()
-        call_args = mock_session_instance.add_exchange.call_args[0]
-        assert "What is the meaning of life?" in call_args[1]
-        assert "The answer is 42" in call_args[2]
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_includes_conversation_history_in_prompt(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that previous conversation is passed to AIGenerator"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "Response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = (
-            "User: Previous question\nAssistant: Previous answer"
-        )
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        rag.query("Follow up question", session_id="session_123")
-
-        call_args = mock_ai_instance.generate_response.call_args
-        history = call_args.kwargs.get("conversation_history")
-        assert history is not None
-        assert "Previous question" in history
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_works_without_session_id(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that query() works when no session_id is provided"""
-        from rag_system import RAGSystem
+        await rag_mocks.rag.query(QUESTION, session_id="session_123")
 
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "Response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_mgr.return_value = mock_session_instance
+        rag_mocks.session_manager.get_conversation_history.assert_called_once_with(
+            "session_123"
+        )
+        assert rag_mocks.ai_generator.calls[-1]["conversation_history"] == history
 
-        config = MockConfig()
-        rag = RAGSystem(config)
+    async def test_query_records_exchange_in_session(self, rag_mocks):
+        """Test that the question and answer are added to the session"""
+        await rag_mocks.rag.query(QUESTION, session_id="session_123")
 
-        response, sources = rag.query("Question without session")
+        rag_mocks.session_manager.add_exchange.assert_called_once_with(
+            "session_123", QUESTION, "Response"
+        )
 
-        # Should not try to get history or add exchange
-        mock_session_instance.get_conversation_history.assert_not_called()
-        mock_session_instance.add_exchange.assert_not_called()
+    async def test_query_without_session(self, rag_mocks):
+        """Test that without a session there is no history to read or update"""
+        response, _ = await rag_mocks.rag.query(QUESTION)
 
         assert response == "Response"
+        rag_mocks.session_manager.get_conversation_history.assert_not_called()
+        rag_mocks.session_manager.add_exchange.assert_not_called()
 
+    async def test_query_returns_sources_from_search(self, rag_mocks):
+        """Test that sources come from the search the AI ran, with lesson URLs"""
+        rag_mocks.ai_generator.tool_calls = [
+            ("search_course_content", {"query": QUESTION})
+        ]
 
-class TestRAGSystemToolIntegration:
-    """Tests for tool registration and execution flow"""
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_search_tool_registered_in_tool_manager(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that CourseSearchTool is registered in ToolManager"""
-        from rag_system import RAGSystem
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        # Verify tool is registered
-        assert "search_course_content" in rag.tool_manager.tools
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_outline_tool_registered_in_tool_manager(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that CourseOutlineTool is registered in ToolManager"""
-        from rag_system import RAGSystem
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        # Verify tool is registered
-        assert "get_course_outline" in rag.tool_manager.tools
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_tool_definitions_passed_to_api(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that tool definitions include required schema"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "Response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        rag.query("Test query", session_id="test")
-
-        call_args = mock_ai_instance.generate_response.call_args
-        tools = call_args.kwargs.get("tools")
-
-        # Should have both tools
-        assert len(tools) == 2
-
-        # Find search tool definition
-        search_tool_def = next(t for t in tools if t["name"] == "search_course_content")
-        assert "input_schema" in search_tool_def
-        assert "query" in search_tool_def["input_schema"]["properties"]
-
-
-class TestRAGSystemPromptFormatting:
-    """Tests for query prompt formatting"""
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_wrapped_in_proper_prompt(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that user query is wrapped in instruction prompt"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "Response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        rag.query("What is MCP?", session_id="test")
-
-        call_args = mock_ai_instance.generate_response.call_args
-        query_param = call_args.kwargs.get("query")
-
-        # Query should include course materials context
-        assert "course materials" in query_param
-        assert "What is MCP?" in query_param
-
-
-class TestRAGSystemSourceHandling:
-    """Tests for source handling edge cases"""
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_empty_sources_handled_gracefully(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that empty sources list is returned when no search performed"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "Direct answer without search"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
+        _, sources = await rag_mocks.rag.query(QUESTION, session_id="test")
 
-        config = MockConfig()
-        rag = RAGSystem(config)
+        assert sources == [
+            {"text": "Test - Lesson 1", "url": LESSON_URL},
+            {"text": "Test", "url": None},
+        ]
 
-        response, sources = rag.query("What is Python?", session_id="test")
+    async def test_query_without_search_returns_no_sources(self, rag_mocks):
+        """Test that a query with no search returns an empty source list"""
+        _, sources = await rag_mocks.rag.query(QUESTION, session_id="test")
 
-        # Should return empty list, not None or error
         assert sources == []
-        assert response == "Direct answer without search"
-
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_sources_include_url_when_available(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
-        """Test that sources include lesson URLs when available"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.return_value = "Response"
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
-
-        # Simulate sources with URLs
-        rag.search_tool.last_sources = [
-            {"text": "Course A - Lesson 1", "url": "https://example.com/lesson1"},
-            {
-                "text": "Course A - Lesson 2",
-                "url": None,
-            },  # Some lessons might not have URLs
-        ]
 
-        response, sources = rag.query("Test", session_id="test")
+    async def test_concurrent_queries_keep_their_own_sources(self, rag_mocks):
+        """Test that overlapping queries do not see each other's sources"""
+
+        async def generate_response(query, tool_manager, **kwargs):
+            tool_manager.execute_tool("search_course_content", query=query)
+            # Let the other query run its search before sources are read
+            await asyncio.sleep(0)
+            return "Response"
+
+        def search(query, **kwargs):
+            # Title each result after the question that was asked
+            title = query.rsplit(": ", 1)[-1]
+            return SearchResults(
+                documents=["content"],
+                metadata=[{"course_title": title}],
+                distances=[0.1],
+            )
+
+        rag_mocks.ai_generator.generate_response = generate_response
+        rag_mocks.vector_store.search.side_effect = search
+
+        (_, sources_a), (_, sources_b) = await asyncio.gather(
+            rag_mocks.rag.query("Course A"), rag_mocks.rag.query("Course B")
+        )
 
-        assert len(sources) == 2
-        assert sources[0]["url"] == "https://example.com/lesson1"
-        assert sources[1]["url"] is None
+        assert sources_a == [{"text": "Course A", "url": None}]
+        assert sources_b == [{"text": "Course B", "url": None}]
 
 
 class TestRAGSystemErrorHandling:
     """Tests for error handling in RAG system"""
 
-    @patch("rag_system.VectorStore")
-    @patch("rag_system.AIGenerator")
-    @patch("rag_system.DocumentProcessor")
-    @patch("rag_system.SessionManager")
-    def test_query_handles_ai_generator_error(
-        self, mock_session_mgr, mock_doc_proc, mock_ai_gen, mock_vector_store
-    ):
+    async def test_query_handles_ai_generator_error(self, rag_mocks):
         """Test that query handles AI generator errors gracefully"""
-        from rag_system import RAGSystem
-
-        mock_ai_instance = MagicMock()
-        mock_ai_instance.generate_response.side_effect = Exception("API Error")
-        mock_ai_gen.return_value = mock_ai_instance
-
-        mock_store_instance = MagicMock()
-        mock_vector_store.return_value = mock_store_instance
-
-        mock_session_instance = MagicMock()
-        mock_session_instance.get_conversation_history.return_value = None
-        mock_session_mgr.return_value = mock_session_instance
-
-        config = MockConfig()
-        rag = RAGSystem(config)
+        rag_mocks.ai_generator.error = RuntimeError("API Error")
 
         # This should raise the exception (current behavior)
         # In a real system, you might want to catch and handle this
-        with pytest.raises(Exception) as exc_info:
-            rag.query("Test query", session_id="test")
+        with pytest.raises(RuntimeError, match="API Error"):
+            await rag_mocks.rag.query("Test query", session_id="test")
 
-        assert "API Error" in str(exc_info.value)
+        assert not rag_mocks.session_manager.add_exchange.called
@@ -10,14 +10,19 @@ These tests evaluate:
 
 import pytest
 from unittest.mock import MagicMock, patch
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from search_tools import CourseSearchTool, ToolManager, CourseOutlineTool
 from vector_store import SearchResults
 
+# Argument types and required arguments Claude sees for search_course_content;
+# descriptions are prompt text and deliberately not pinned
+SEARCH_TOOL_ARG_TYPES = {
+    "query": "string",
+    "course_name": "string",
+    "lesson_number": "integer",
+}
+SEARCH_TOOL_REQUIRED = ["query"]
+
 
 class TestCourseSearchToolExecute:
     """Tests for CourseSearchTool.execute() method"""
@@ -231,13 +236,22 @@ class TestCourseSearchToolFormatting:
 class TestToolManager:
     """Tests for ToolManager functionality"""
 
-    def test_register_tool_adds_tool_to_manager(self, mock_vector_store):
+    @pytest.mark.parametrize(
+        "tool_class, name",
+        [
+            (CourseSearchTool, "search_course_content"),
+            (CourseOutlineTool, "get_course_outline"),
+        ],
+    )
+    def test_register_tool_adds_tool_to_manager(
+        self, mock_vector_store, tool_class, name
+    ):
         """Test that register_tool properly adds tools"""
         manager = ToolManager()
-        tool = CourseSearchTool(mock_vector_store)
+        tool = tool_class(mock_vector_store)
         manager.register_tool(tool)
 
-        assert "search_course_content" in manager.tools
+        assert manager.tools[name] is tool
 
     def test_get_tool_definitions_returns_all_registered_tools(self, mock_vector_store):
         """Test that get_tool_definitions returns definitions for all tools"""
@@ -315,9 +329,12 @@ class TestCourseSearchToolDefinition:
         tool = CourseSearchTool(mock_vector_store)
         definition = tool.get_tool_definition()
 
+        schema = definition["input_schema"]
+
         assert definition["name"] == "search_course_content"
-        assert "description" in definition
-        assert "input_schema" in definition
-        assert definition["input_schema"]["type"] == "object"
-        assert "query" in definition["input_schema"]["properties"]
-        assert "query" in definition["input_schema"]["required"]
+        assert definition["description"]
+        assert schema["type"] == "object"
+        assert {
+            name: prop["type"] for name, prop in schema["properties"].items()
+        } == SEARCH_TOOL_ARG_TYPES
+        assert schema["required"] == SEARCH_TOOL_REQUIRED
@@ -0,0 +1,87 @@
+"""
+Tests for SessionManager in session_manager.py
+
+These tests evaluate:
+1. Conversation history shape (role/content messages)
+2. History truncation to max_history exchanges
+3. Missing or empty sessions
+"""
+
+import pytest
+
+from session_manager import SessionManager
+
+
+class TestSessionManagerHistory:
+    """Tests for SessionManager.get_conversation_history()"""
+
+    def test_history_returns_role_content_messages(self):
+        """Test that history is a list of role/content dicts in order"""
+        manager = SessionManager(max_history=2)
+        session_id = manager.create_session()
+        manager.add_exchange(session_id, "What is MCP?", "Model Context Protocol.")
+
+        history = manager.get_conversation_history(session_id)
+
+        assert history == [
+            {"role": "user", "content": "What is MCP?"},
+            {"role": "assistant", "content": "Model Context Protocol."},
+        ]
+
+    def test_history_truncated_to_max_history_exchanges(self):
+        """Test that only the last max_history exchanges are kept"""
+        manager = SessionManager(max_history=2)
+        session_id = manager.create_session()
+        for i in range(3):
+            manager.add_exchange(session_id, f"Question {i}", f"Answer {i}")
+
+        history = manager.get_conversation_history(session_id)
+
+        assert len(history) == 4
+        assert [m["content"] for m in history] == [
+            "Question 1",
+            "Answer 1",
+            "Question 2",
+            "Answer 2",
+        ]
+
+    def test_truncated_history_starts_with_user_message(self):
+        """Test that truncation keeps user/assistant alternation for the API"""
+        manager = SessionManager(max_history=1)
+        session_id = manager.create_session()
+        for i in range(5):
+            manager.add_exchange(session_id, f"Question {i}", f"Answer {i}")
+
+        history = manager.get_conversation_history(session_id)
+
+        assert [m["role"] for m in history] == ["user", "assistant"]
+
+    def test_history_is_a_copy_of_session_state(self):
+        """Test that mutating returned history does not change the session"""
+        manager = SessionManager(max_history=2)
+        session_id = manager.create_session()
+        manager.add_exchange(session_id, "Question", "Answer")
+
+        history = manager.get_conversation_history(session_id)
+        history[0]["content"] = "Changed"
+
+        assert manager.get_conversation_history(session_id)[0]["content"] == (
+            "Question"
+        )
+
+    @pytest.mark.parametrize("session_id", [None, "", "unknown-session"])
+    def test_history_none_for_missing_session(self, session_id):
+        """Test that missing sessions have no history"""
+        manager = SessionManager()
+
+        assert manager.get_conversation_history(session_id) is None
+
+    def test_history_none_for_empty_or_cleared_session(self):
+        """Test that sessions without messages have no history"""
+        manager = SessionManager()
+        session_id = manager.create_session()
+        assert manager.get_conversation_history(session_id) is None
+
+        manager.add_exchange(session_id, "Question", "Answer")
+        manager.clear_session(session_id)
+        assert manager.get_conversation_history(session_id) is None
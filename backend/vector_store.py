@@ -18,16 +18,15 @@ class SearchResults:
     @classmethod
     def from_chroma(cls, chroma_results: Dict) -> "SearchResults":
         """Create SearchResults from ChromaDB query results"""
+        # A query returns documents, metadatas and distances together, so one
+        # check on documents covers the empty and None-valued cases
+        documents = chroma_results.get("documents")
+        if not documents:
+            return cls(documents=[], metadata=[], distances=[])
         return cls(
-            documents=(
-                chroma_results["documents"][0] if chroma_results["documents"] else []
-            ),
-            metadata=(
-                chroma_results["metadatas"][0] if chroma_results["metadatas"] else []
-            ),
-            distances=(
-                chroma_results["distances"][0] if chroma_results["distances"] else []
-            ),
+            documents=documents[0],
+            metadata=chroma_results["metadatas"][0],
+            distances=chroma_results["distances"][0],
         )
 
     @classmethod
@@ -43,19 +42,31 @@ class SearchResults:
 class VectorStore:
     """Vector storage using ChromaDB for course content and metadata"""
 
-    def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
+    def __init__(
+        self,
+        chroma_path: Optional[str],
+        embedding_model: str,
+        max_results: int = 5,
+        embedding_function=None,
+        client=None,
+    ):
         self.max_results = max_results
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=chroma_path, settings=Settings(anonymized_telemetry=False)
-        )
-
-        # Set up sentence transformer embedding function
-        self.embedding_function = (
-            chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
-                model_name=embedding_model
+        # Initialize ChromaDB client (chroma_path is unused when one is given)
+        if client is None:
+            client = chromadb.PersistentClient(
+                path=chroma_path, settings=Settings(anonymized_telemetry=False)
             )
-        )
+        self.client = client
+
+        # Set up sentence transformer embedding function. Loading the model is
+        # expensive, so callers that build several stores can pass one in.
+        if embedding_function is None:
+            embedding_function = (
+                chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=embedding_model
+                )
+            )
+        self.embedding_function = embedding_function
 
         # Create collections for different types of data
         self.course_catalog = self._create_collection(
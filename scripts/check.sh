@@ -6,6 +6,9 @@
 #   format  - Format code with black
 #   check   - Check formatting without making changes
 #   test    - Run pytest
+#   test-fast - Run pytest without tests marked slow
+#   test-integration - Run pytest including integration tests
+#   bench   - Run the AIGenerator benchmarks in-process
 #   all     - Run all checks (default)
 
 set -e
@@ -31,6 +34,24 @@ run_tests() {
     echo "Tests complete!"
 }
 
+run_fast_tests() {
+    echo "Running fast tests..."
+    cd backend && uv run pytest -m "not slow"
+    echo "Fast tests complete!"
+}
+
+run_integration_tests() {
+    echo "Running tests including integration..."
+    cd backend && uv run pytest --integration
+    echo "Tests complete!"
+}
+
+run_bench() {
+    echo "Running benchmarks..."
+    cd backend && uv run pytest tests/test_ai_generator_bench.py -n0 -p no:randomly
+    echo "Benchmarks complete!"
+}
+
 run_all() {
     echo "Running all quality checks..."
     echo ""
@@ -51,12 +72,21 @@ case "${1:-all}" in
     test)
         run_tests
         ;;
+    test-fast)
+        run_fast_tests
+        ;;
+    test-integration)
+        run_integration_tests
+        ;;
+    bench)
+        run_bench
+        ;;
     all)
         run_all
         ;;
     *)
         echo "Unknown command: $1"
-        echo "Usage: $0 [format|check|test|all]"
+        echo "Usage: $0 [format|check|test|test-fast|test-integration|bench|all]"
         exit 1
         ;;
 esac